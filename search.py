@@ -0,0 +1,544 @@
+"""
+Shared search engine for the puzzle solvers.
+
+A problem works on compact integer keys and supplies
+    encode(state)       -> int key for a puzzle state
+    successors(key)     -> iterable of (next_key, action, step_cost)
+    is_goal(key)        -> bool
+    heuristic(key)      -> estimated cost to the goal      (optional, A*)
+    expand(key, h)      -> successors as (next_key, action, step_cost, next_h)
+                           with h updated incrementally  (optional, A*)
+    predecessors(key)   -> iterable like successors, reversed moves
+                           (optional, bidirectional BFS)
+    solvable(key)       -> False if the goal cannot be reached from key
+                           (optional, every search returns None upfront)
+
+Astar() takes a weight w and orders by g + w*h, a solution then costs at most
+w times the optimum. ARAstar() reruns it with a falling weight until a
+deadline, reusing the earlier work, and reports each solution's bound.
+
+descend() needs no search at all when an exact distance(key) is known, it
+just follows successors that are one step closer to the goal.
+
+Every node the engine discovers gets an id; keys, parent ids, actions and
+path costs are stored in flat per-id arrays, and a dict maps keys to ids so
+frontier/explored membership is a hash lookup. The A* heaps only take a node
+again when its g improves (lazy decrease-key, the old entry is skipped and
+counted as stale when popped) and break f ties on the lower h.
+
+Each run leaves a SearchStats in engine.stats.
+"""
+import functools
+import heapq
+import json
+import os
+import threading
+import tracemalloc
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class SearchStats:
+    def __init__(self, method="") -> None:
+        self.method = method
+        self.solved = False
+        self.depth = None           # path cost of the solution
+        self.generated = 0          # successors produced
+        self.expanded = 0           # nodes whose successors were produced
+        self.duplicates = 0         # successors dropped as already seen
+        self.stale = 0              # heap entries popped after a cheaper path replaced them
+        self.peak_frontier = 0
+        self.elapsed = 0.0          # seconds
+        self.peak_memory = 0        # bytes
+        self.memory_source = None   # "tracemalloc" or "rss"
+        self.bound = None           # solution cost is at most bound * optimal
+
+    @property
+    def nodes_per_sec(self):
+        return self.expanded / self.elapsed if self.elapsed else 0.0
+
+    def frontier(self, size):
+        if size > self.peak_frontier:
+            self.peak_frontier = size
+
+    def to_dict(self):
+        stats = dict(vars(self))
+        stats["nodes_per_sec"] = self.nodes_per_sec
+        return stats
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    def dump(self, path, **extra):
+        # one JSON object per line, so runs can be appended and diffed later
+        with open(path, "a") as file:
+            file.write(json.dumps({**extra, **self.to_dict()}) + "\n")
+
+    def __str__(self):
+        return (
+            f"{self.method}: expanded {self.expanded}, generated {self.generated}, "
+            f"duplicates {self.duplicates}, stale {self.stale}, peak frontier {self.peak_frontier}, "
+            f"{self.nodes_per_sec:.0f} nodes/s, peak memory {self.peak_memory / 1024:.1f} KiB ({self.memory_source})"
+        )
+
+
+def peak_rss():
+    # process-wide high-water mark, ru_maxrss is in KiB on Linux
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_rss():
+    # resident set size now, None where /proc is not available
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RSSSampler:
+    # peak RSS of a block above the RSS it started at. A thread samples the
+    # current RSS every interval seconds; if the process high-water mark rose
+    # during the block, that new mark was reached inside it and is exact
+    def __init__(self, interval=0.005) -> None:
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.start_rss = current_rss()
+        self.start_max = peak_rss()
+        self.peak = self.start_rss or 0
+        self.thread = None
+        if self.start_rss is not None:
+            self.thread = threading.Thread(target=self.sample, daemon=True)
+            self.thread.start()
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss() or 0)
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        end_max = peak_rss()
+        if self.start_rss is None:
+            # no current RSS to sample, only the growth of the high-water mark
+            return end_max - self.start_max
+        peak = max(self.peak, current_rss() or 0)
+        if end_max > self.start_max:
+            peak = max(peak, end_max)
+        return max(0, peak - self.start_rss)
+
+
+@contextmanager
+def measure(owner, trace_memory=False):
+    # times the block and records peak memory into owner.stats, which is looked
+    # up at the end so the block may replace it. With trace_memory the peak is
+    # what the block itself allocated (tracemalloc), otherwise how far the
+    # process's RSS rose above where it was when the block began
+    started = trace_memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    if trace_memory:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+    else:
+        sampler = RSSSampler()
+    began = perf_counter()
+    try:
+        yield
+    finally:
+        stats = owner.stats
+        stats.elapsed = perf_counter() - began
+        if trace_memory:
+            stats.peak_memory = tracemalloc.get_traced_memory()[1] - baseline
+            stats.memory_source = "tracemalloc"
+            if started:
+                tracemalloc.stop()
+        else:
+            stats.peak_memory = sampler.stop()
+            stats.memory_source = "rss"
+
+
+def instrumented(search):
+    @functools.wraps(search)
+    def run(self, start, *args, **kwargs):
+        solvable = getattr(self.problem, "solvable", None)
+        if solvable is not None and not solvable(start):
+            self.reset()
+            self.stats.method = search.__name__
+            return None
+        with measure(self, self.trace_memory):
+            node = search(self, start, *args, **kwargs)
+        stats = self.stats
+        stats.method = search.__name__
+        stats.solved = node is not None
+        stats.depth = self.g[node] if node is not None else None
+        return node
+
+    return run
+
+
+class Engine:
+    def __init__(self, problem, trace_memory=False) -> None:
+        self.problem = problem
+        self.trace_memory = trace_memory
+        self.reset()
+
+    def reset(self):
+        self.index = {}             # key -> node id
+        self.keys = []              # node id -> key
+        self.parents = array("i")   # node id -> parent node id (-1 for the root)
+        self.actions = []           # node id -> action that led to it
+        self.g = []                 # node id -> path cost from the root
+        self.bounds = []            # ARAstar: (elapsed, cost, bound, weight) per solution
+        self.stats = SearchStats()
+
+    def add(self, key, parent=-1, action=None, g=0):
+        node = len(self.keys)
+        self.index[key] = node
+        self.keys.append(key)
+        self.parents.append(parent)
+        self.actions.append(action)
+        self.g.append(g)
+        return node
+
+    def path(self, node):
+        path = []
+        while node != -1:
+            path.append((self.keys[node], self.actions[node]))
+            node = self.parents[node]
+        path.reverse()
+        return path
+
+    def solve(self, method, start, *args, **kwargs):
+        node = getattr(self, method)(start, *args, **kwargs)
+        return None if node is None else self.path(node)
+
+    @instrumented
+    def BFS(self, start):
+        self.reset()
+        problem, stats = self.problem, self.stats
+        root = self.add(start)
+        if problem.is_goal(start):
+            return root
+        frontier = deque([root])
+
+        while frontier:
+            node = frontier.popleft()
+            stats.expanded += 1
+            g = self.g[node] + 1
+            for key, action, _ in problem.successors(self.keys[node]):
+                stats.generated += 1
+                if key in self.index:
+                    stats.duplicates += 1
+                    continue
+                child = self.add(key, node, action, g)
+                if problem.is_goal(key):
+                    return child
+                frontier.append(child)
+            stats.frontier(len(frontier))
+        return None
+
+    @instrumented
+    def DFS(self, start):
+        self.reset()
+        problem, stats = self.problem, self.stats
+        frontier = [self.add(start)]
+
+        while frontier:
+            node = frontier.pop()
+            key = self.keys[node]
+            if problem.is_goal(key):
+                return node
+            stats.expanded += 1
+            g = self.g[node] + 1
+            for key, action, _ in problem.successors(key):
+                stats.generated += 1
+                if key in self.index:
+                    stats.duplicates += 1
+                    continue
+                frontier.append(self.add(key, node, action, g))
+            stats.frontier(len(frontier))
+        return None
+
+    def scored(self, key, h, expand):
+        # successors as (key, action, cost, h), h is None unless expand gives it
+        if expand is not None:
+            return expand(key, h)
+        return ((key, action, cost, None) for key, action, cost in self.problem.successors(key))
+
+    def heuristics(self, heuristic):
+        # expand(key, h) yields successors with their heuristic already updated
+        # incrementally; it is only used with the problem's own heuristic
+        problem = self.problem
+        expand = getattr(problem, "expand", None) if heuristic is None else None
+        if heuristic is None:
+            heuristic = getattr(problem, "heuristic", None) or (lambda key: 0)
+        return heuristic, expand
+
+    @instrumented
+    def Astar(self, start, heuristic=None, weight=1):
+        # weight > 1 is weighted A*: f = g + weight * h
+        self.reset()
+        problem, stats = self.problem, self.stats
+        heuristic, expand = self.heuristics(heuristic)
+        root = self.add(start)
+        h = heuristic(start)
+        frontier = [(weight * h, h, 0, root)]
+        closed = set()
+
+        while frontier:
+            _, h, g, node = heapq.heappop(frontier)
+            if node in closed or g > self.g[node]:
+                stats.stale += 1
+                continue
+            key = self.keys[node]
+            if problem.is_goal(key):
+                stats.bound = weight
+                return node
+            closed.add(node)
+            stats.expanded += 1
+
+            for key, action, cost, h in self.scored(key, h, expand):
+                stats.generated += 1
+                new_g = g + cost
+                child = self.index.get(key)
+                if child is None:
+                    child = self.add(key, node, action, new_g)
+                elif new_g < self.g[child]:
+                    self.parents[child] = node
+                    self.actions[child] = action
+                    self.g[child] = new_g
+                    closed.discard(child)
+                else:
+                    stats.duplicates += 1
+                    continue
+                if h is None:
+                    h = heuristic(key)
+                heapq.heappush(frontier, (new_g + weight * h, h, new_g, child))
+            stats.frontier(len(frontier))
+        return None
+
+    @instrumented
+    def ARAstar(self, start, deadline, heuristic=None, weight=3.0, step=0.5, report=None):
+        # anytime repairing A*: weighted A* with weight falling by step after
+        # every solution, down to 1. A node whose g improves after it was
+        # expanded is not reopened in that round but kept aside (incons) and
+        # requeued for the next, so no round redoes the work of the previous
+        # one. Stops at the deadline (seconds) or once the bound reaches 1;
+        # each solution is appended to self.bounds and passed to
+        # report(cost, bound) when given. Returns the best goal node found
+        self.reset()
+        problem, stats = self.problem, self.stats
+        heuristic, expand = self.heuristics(heuristic)
+        began = perf_counter()
+        end = began + deadline
+        hs = [heuristic(start)]     # node id -> h
+        root = self.add(start)
+        goal = None
+        if problem.is_goal(start):
+            return root
+        queued = {root}
+        frontier = [(weight * hs[root], hs[root], 0, root)]
+        incons = set()
+        timeout = False
+
+        while True:
+            closed = set()
+            while frontier and (goal is None or frontier[0][0] < self.g[goal]):
+                if perf_counter() > end:
+                    timeout = True
+                    break
+                _, _, g, node = heapq.heappop(frontier)
+                if node not in queued or g > self.g[node]:
+                    stats.stale += 1
+                    continue
+                queued.discard(node)
+                closed.add(node)
+                stats.expanded += 1
+
+                for key, action, cost, h in self.scored(self.keys[node], hs[node], expand):
+                    stats.generated += 1
+                    new_g = g + cost
+                    child = self.index.get(key)
+                    if child is None:
+                        child = self.add(key, node, action, new_g)
+                        hs.append(heuristic(key) if h is None else h)
+                        if problem.is_goal(key):
+                            goal = child
+                    elif new_g < self.g[child]:
+                        self.parents[child] = node
+                        self.actions[child] = action
+                        self.g[child] = new_g
+                    else:
+                        stats.duplicates += 1
+                        continue
+                    if child in closed:
+                        incons.add(child)
+                    else:
+                        queued.add(child)
+                        heapq.heappush(frontier, (new_g + weight * hs[child], hs[child], new_g, child))
+                stats.frontier(len(frontier))
+
+            if goal is None or timeout:
+                return goal
+            # the optimum is at least the smallest unweighted f still pending
+            pending = queued | incons
+            lower = min((self.g[n] + hs[n] for n in pending), default=self.g[goal])
+            bound = min(weight, self.g[goal] / lower) if lower else weight
+            stats.bound = bound
+            self.bounds.append((perf_counter() - began, self.g[goal], bound, weight))
+            if report is not None:
+                report(self.g[goal], bound)
+            if weight <= 1 or bound <= 1:
+                return goal
+            weight = max(1, weight - step)
+            queued = pending
+            incons = set()
+            frontier = [(self.g[n] + weight * hs[n], hs[n], self.g[n], n) for n in queued]
+            heapq.heapify(frontier)
+
+    def UCS(self, start):
+        node = self.Astar(start, heuristic=lambda key: 0)
+        self.stats.method = "UCS"
+        return node
+
+    @instrumented
+    def bidirectionalBFS(self, start, goal):
+        # the forward side lives in the node arrays, the backward side in a dict
+        # key -> (child key, action, depth); on a meet the backward chain is
+        # appended to the arrays so path() works as for every other search
+        self.reset()
+        problem, stats = self.problem, self.stats
+        root = self.add(start)
+        if start == goal:
+            return root
+        backward = {goal: (None, None, 0)}
+        forward_layer, backward_layer = [root], [goal]
+        meet = None
+
+        while meet is None and forward_layer and backward_layer:
+            best = None
+            next_layer = []
+            if len(forward_layer) <= len(backward_layer):
+                stats.expanded += len(forward_layer)
+                for node in forward_layer:
+                    g = self.g[node] + 1
+                    for key, action, _ in problem.successors(self.keys[node]):
+                        stats.generated += 1
+                        if key in self.index:
+                            stats.duplicates += 1
+                            continue
+                        next_layer.append(self.add(key, node, action, g))
+                        if key in backward and (best is None or g + backward[key][2] < best):
+                            meet, best = key, g + backward[key][2]
+                forward_layer = next_layer
+            else:
+                stats.expanded += len(backward_layer)
+                for key in backward_layer:
+                    depth = backward[key][2] + 1
+                    for prev, action, _ in problem.predecessors(key):
+                        stats.generated += 1
+                        if prev in backward:
+                            stats.duplicates += 1
+                            continue
+                        backward[prev] = (key, action, depth)
+                        next_layer.append(prev)
+                        if prev in self.index and (best is None or self.g[self.index[prev]] + depth < best):
+                            meet, best = prev, self.g[self.index[prev]] + depth
+                backward_layer = next_layer
+            stats.frontier(len(forward_layer) + len(backward_layer))
+
+        if meet is None:
+            return None
+        node = self.index[meet]
+        key = meet
+        while backward[key][0] is not None:
+            key, action, _ = backward[key]
+            node = self.add(key, node, action, self.g[node] + 1)
+        return node
+
+    @instrumented
+    def IDDFS(self, start, max_depth=None, table_size=1 << 20):
+        # depth-limited DFS with a growing limit, only the current path is kept.
+        # The transposition table holds the shallowest depth each key was reached
+        # at in this iteration (a key seen at <= depth has nothing new below it);
+        # once it holds table_size keys it only updates existing entries
+        self.reset()
+        problem, stats = self.problem, self.stats
+        if problem.is_goal(start):
+            return self.add(start)
+        limit = 1
+
+        while max_depth is None or limit <= max_depth:
+            table = {start: 0}
+            keys, actions = [start], [None]
+            stack = [iter(problem.successors(start))]
+            stats.expanded += 1
+            cutoff = False
+
+            while stack:
+                item = next(stack[-1], None)
+                if item is None:
+                    stack.pop()
+                    keys.pop()
+                    actions.pop()
+                    continue
+                stats.generated += 1
+                key, action, _ = item
+                depth = len(keys)
+                seen = table.get(key)
+                if seen is not None and seen <= depth:
+                    stats.duplicates += 1
+                    continue
+                if seen is not None or len(table) < table_size:
+                    table[key] = depth
+
+                if problem.is_goal(key):
+                    node = -1
+                    for g, (key, action) in enumerate(zip(keys + [key], actions + [action])):
+                        node = self.add(key, node, action, g)
+                    return node
+                if depth < limit:
+                    keys.append(key)
+                    actions.append(action)
+                    stack.append(iter(problem.successors(key)))
+                    stats.expanded += 1
+                    stats.frontier(len(stack))
+                else:
+                    cutoff = True
+
+            if not cutoff:
+                return None
+            limit += 1
+        return None
+
+    @instrumented
+    def descend(self, start, distance):
+        # distance(key) is the exact number of moves to the goal (None if
+        # unreachable), so the path is read off in O(depth) lookups
+        self.reset()
+        problem, stats = self.problem, self.stats
+        node = self.add(start)
+        d = distance(start)
+        if d is None:
+            return None
+        key = start
+        while d:
+            stats.expanded += 1
+            for next_key, action, _ in problem.successors(key):
+                stats.generated += 1
+                if distance(next_key) == d - 1:
+                    break
+            node = self.add(next_key, node, action, self.g[node] + 1)
+            key, d = next_key, d - 1
+        return node
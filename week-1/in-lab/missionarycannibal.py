@@ -1,167 +1,185 @@
+import os
 import sys
+from array import array
 from collections import deque
 
-class State:
-    def __init__(self,m,c,b,parent = None,action ="initial-state") -> None:
-        self.positions = [m,c,b ]   
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from search import Engine
+
+
+class Problem:
+    def __init__(self, m=3, c=3, k=2) -> None:
         '''
-        (m,c,b) = (0..3, 0..3,0/1) 
-        boat : left = 0
+        m missionaries and c cannibals start on the left bank, boat holds k.
+        A state (m,c,b) is packed into one int: ((m*(c+1))+c)*2 + b
+        m,c : people on the left bank
+        boat : left = 1, right = 0
         '''
-        self.parent = parent
-        self.action = action
-        if action != "initial-state":
-            # self.bun ,self.bun_ini,self.bun_steps,self.bun_final = action
-            
-            self.shortest_path = sys.maxsize
-        else:
-            self.action = action
-            self.shortest_path = 0    
-        
-    def setShortest(self):
-        self.shortest_path = min(self.shortest_path,self.parent.shortest_path)
-
-    
-    def isGoal(self):
-        return self.positions ==[0]*len(self.positions) 
-    
-    def __eq__(self,state):
-        return state.positions == self.positions
-
-    def __hash__(self) -> int:
-        return hash(tuple(self.positions))
-    
-    def isValid(self)->bool:
-        m,c,b = self.positions
-        if m>3 or c>3 or m<0 or c<0:
+        self.m = m
+        self.c = c
+        self.k = k
+        self.size = (m + 1) * (c + 1) * 2
+        # every boat load with 1..k people, fullest loads first
+        self.moves = [(i, total - i) for total in range(k, 0, -1) for i in range(total, -1, -1)]
+
+    def encode(self, m, c, b) -> int:
+        return (m * (self.c + 1) + c) * 2 + b
+
+    def decode(self, key):
+        m, c = divmod(key >> 1, self.c + 1)
+        return m, c, key & 1
+
+    def isValid(self, m, c) -> bool:
+        if m > self.m or c > self.c or m < 0 or c < 0:
             return False
-        if m>0 and m<c:
+        if m > 0 and m < c:
             return False
-        
-        if 3-m>0 and 3-m <3-c:
+        if self.m - m > 0 and self.m - m < self.c - c:
             return False
         return True
 
-
-    def generateStates(self):
-        possibleStates = []
-        m,c,b = self.positions
-        # combinations of people: mm,mc,cc,m,c
-        moves = [(2, 0), (0, 2), (1, 1), (1, 0), (0, 1)]
-
-        mul = 1 if b==0 else -1 
-        for move in moves:
-            new_state = State(m+mul*(move[0]), c+mul*(move[1]), 0 if b==1 else 1,self,action=[move,b])
-            if new_state.isValid():
-                possibleStates.append(new_state)
-
-        return possibleStates
-
-    def printgenerateStatess(self):
-        states = self.generateStates()
-        for x in states:
-            print(x.positions)
-        print("")
-
-def BFS(initialState:State):
-    frontier = deque([initialState])
-    explored = set()
-    
-    while frontier:
-        curr_state = frontier.popleft()
-        if curr_state in explored:
-            continue
-        explored.add(curr_state)
-        if curr_state.isGoal():
-            print("Number of Valid Nodes Explored: ",len(explored))
-            return curr_state
-        
-        possibleStates = curr_state.generateStates()
-        for state in possibleStates:
-            if (state not in explored) and (state not in frontier):
-                frontier.append(state)
-    print("Number of Valid Nodes Explored: ",len(explored))
-    return None
-
-
-def DFS(initialState:State):
-    frontier = [initialState]
-    explored = set()
-    
-    while frontier:
-        curr_state = frontier.pop()    
-        if curr_state.isGoal():
-            print("Number of Valid Nodes Explored: ",len(explored))
-            return curr_state
-        explored.add(curr_state)
-        
-        possibleStates = curr_state.generateStates()
-        for state in possibleStates:
-            if (state not in explored) and (state not in frontier):
-                frontier.append(state)
-    return None
-
-def solutionBFS(initialState:State):
-    
-    goal = BFS(initialState)
-    path = [goal]
-    if not goal:
-        return None
-    parent = goal.parent
-
-    while parent:
-        path.append(parent)
-        parent = parent.parent
-    while path:
-        state = path.pop()
-        m,c,b = state.positions
-        boat = (" "*5)+"B"+(" "*5)
-        print(f'{m*' M '+(3-m)*'   '}{c*' C '+(3-c)*'   '}|{boat.rstrip() if b==0 else boat.lstrip()}|{(3-m)*' M '+m*"   "}{(3-c)*' C '+c*"   "}',end = ": ")
-
-        if state.action == 'initial-state':
-            print(state.action)
+    def is_goal(self, key):
+        return key == 0
+
+    def successors(self, key):
+        m, c, b = self.decode(key)
+        mul = -1 if b == 1 else 1
+        for dm, dc in self.moves:
+            new_m, new_c = m + mul * dm, c + mul * dc
+            if self.isValid(new_m, new_c):
+                yield self.encode(new_m, new_c, 1 - b), (dm, dc), 1
+
+    # a crossing is undone by the same group rowing back, so the graph is undirected
+    predecessors = successors
+
+
+class DistanceTable:
+    # distance to the goal and the next state on a shortest path, for every state
+    # of one (m,c,k) problem; -1 marks invalid or unsolvable states
+    def __init__(self, problem: Problem, dist, next_state) -> None:
+        self.problem = problem
+        self.dist = dist
+        self.next_state = next_state
+
+    @classmethod
+    def build(cls, problem: Problem):
+        # reverse BFS from the goal over the valid state graph
+        dist = array('i', [-1]) * problem.size
+        next_state = array('i', [-1]) * problem.size
+        dist[0] = 0
+        frontier = deque([0])
+        while frontier:
+            key = frontier.popleft()
+            for prev, _, _ in problem.predecessors(key):
+                if dist[prev] == -1:
+                    dist[prev] = dist[key] + 1
+                    next_state[prev] = key
+                    frontier.append(prev)
+        return cls(problem, dist, next_state)
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            array('i', [self.problem.m, self.problem.c, self.problem.k]).tofile(file)
+            self.dist.tofile(file)
+            self.next_state.tofile(file)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            header = array('i')
+            header.fromfile(file, 3)
+            problem = Problem(*header)
+            dist, next_state = array('i'), array('i')
+            dist.fromfile(file, problem.size)
+            next_state.fromfile(file, problem.size)
+        return cls(problem, dist, next_state)
+
+    def solve(self, start: int):
+        # O(path length) walk along the stored next states
+        if self.dist[start] == -1:
+            return None
+        path = [start]
+        while path[-1] != 0:
+            path.append(self.next_state[path[-1]])
+        return path
+
+
+def printPath(problem: Problem, path):
+    M, C = problem.m, problem.c
+    prev = None
+    for key in path:
+        m, c, b = problem.decode(key)
+        boat = (" " * 5) + "B" + (" " * 5)
+        left = m * " M " + (M - m) * "   " + c * " C " + (C - c) * "   "
+        right = (M - m) * " M " + m * "   " + (C - c) * " C " + c * "   "
+        print(f"{left}|{boat.rstrip() if b == 0 else boat.lstrip()}|{right}", end=": ")
+
+        if prev is None:
+            print("initial-state")
         else:
-            move,boat_move = state.action
-            direction = "RIGHT TO LEFT"if boat_move == 0 else "LEFT TO RIGHT"
-            statement = f"{move[0]} missionaries" if move[0] else "" + ("and" if move[0] else "")+ f"{move[1]} cannibals" if move[1] else ""
-            print(statement+" move "+direction)
+            pm, pc, pb = prev
+            moved = [f"{abs(pm - m)} missionaries" if pm != m else "", f"{abs(pc - c)} cannibals" if pc != c else ""]
+            direction = "RIGHT TO LEFT" if pb == 0 else "LEFT TO RIGHT"
+            print(" and ".join(x for x in moved if x) + " move " + direction)
+        prev = (m, c, b)
         print()
 
-def solutionDFS(initialState:State):
-    
-    goal = DFS(initialState)
-    path = [goal]
-    if not goal:
+
+def solve(problem: Problem, start: int, method):
+    engine = Engine(problem)
+    path = engine.solve(method, start)
+    print(engine.stats)
+    if path is None:
         return None
-    parent = goal.parent
-
-    while parent:
-        path.append(parent)
-        parent = parent.parent
-    while path:
-        state = path.pop()
-        m,c,b = state.positions
-        boat = (" "*5)+"B"+(" "*5)
-        print(f'{m*' M '+(3-m)*'   '}{c*' C '+(3-c)*'   '}|{boat.rstrip() if b==0 else boat.lstrip()}|{(3-m)*' M '+m*"   "}{(3-c)*' C '+c*"   "}',end = ": ")
-
-        if state.action == 'initial-state':
-            print(state.action)
-        else:
-            move,boat_move = state.action
-            direction = "RIGHT TO LEFT"if boat_move == 0 else "LEFT TO RIGHT"
-            statement = f"{move[0]} missionaries" if move[0] else "" + ("and" if move[0] else "")+ f"{move[1]} cannibals" if move[1] else ""
-            print(statement+" move "+direction)
-        print()
+    path = [key for key, _ in path]
+    printPath(problem, path)
+    return path
+
+
+def solutionBFS(problem: Problem, start: int):
+    return solve(problem, start, "BFS")
+
+
+def solutionDFS(problem: Problem, start: int):
+    return solve(problem, start, "DFS")
+
+
+def solutionIDDFS(problem: Problem, start: int):
+    return solve(problem, start, "IDDFS")
+
+
+def solutionTable(table: DistanceTable, start: int):
+    path = table.solve(start)
+    if path is None:
+        return None
+    printPath(table.problem, path)
+    return path
+
+
+# main() only runs IDDFS on problems with at most this many states
+IDDFS_STATES = 2000
+
+
 def main():
 
-    ini = eval(input("Initial-State: "))
-    initialState = State(ini[0],ini[1],ini[2]) # [3,3,1]
-    
-    # initialState.printgenerateStatess()
+    m, c, k = eval(input("Missionaries, Cannibals, Boat-Capacity: "))  # 3,3,2
+    ini = eval(input("Initial-State: "))  # [3,3,1]
+    problem = Problem(m, c, k)
+    start = problem.encode(ini[0], ini[1], ini[2])
+
     print("BFS ")
-    solutionBFS(initialState)
+    solutionBFS(problem, start)
     print("\nDFS ")
-    solutionDFS(initialState)
-    
+    solutionDFS(problem, start)
+    print("\nIDDFS ")
+    # IDDFS rescans the states once per depth, which takes too long past small boards
+    if 2 * (m + 1) * (c + 1) <= IDDFS_STATES:
+        solutionIDDFS(problem, start)
+    else:
+        print(f"skipped, more than {IDDFS_STATES} states")
+    print("\nDistance Table ")
+    solutionTable(DistanceTable.build(problem), start)
+
+
 if __name__ == "__main__":
     main()
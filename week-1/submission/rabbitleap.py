@@ -1,174 +1,240 @@
+import os
 import sys
-class State:
-    def __init__(self,positions,parent = None,action ="initial-state") -> None:
-        self.positions = positions # -1 -> west moving (-), 1-> east moving (+), 0 empty stone
-        self.parent = parent
-        if action != "initial-state":
-            self.bun ,self.bun_ini,self.bun_steps,self.bun_final = action
-            self.action = "intermediary-state"
-            self.shortest_path = sys.maxsize
-        else:
-            self.action = action
-            self.shortest_path = 0    
-        
-    def setShortest(self):
-        self.shortest_path = min(self.shortest_path,self.parent.shortest_path)
 
-    
-    def isGoal(self):
-        return self.positions ==[0]*len(self.positions) 
-    
-    def __eq__(self,state):
-        return state.positions == self.positions
+import numpy as np
 
-    def __hash__(self) -> int:
-        return hash(tuple(self.positions))
-    def generateStates(self):
-        possibleStates = []
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..",".."))
+from search import Engine
 
-        n = len(self.positions)
-        
-        for i in range(n):
-            bun = self.positions[i]
-            if bun==0: 
+
+class Board:
+    # base-3 encoding of a board: digit i is 0 (empty), 1 (east-facing) or 2 (west-facing)
+    def __init__(self,n,start=None) -> None:
+        self.n = n
+        self.pow3 = [3**i for i in range(n)]
+        self.start = start
+
+    def encode(self,positions) -> int:
+        return sum((bun%3)*p for bun,p in zip(positions,self.pow3))
+
+    def is_goal(self,code):
+        return code==0
+
+    def decode(self,code):
+        positions = []
+        for _ in range(self.n):
+            code,digit = divmod(code,3)
+            positions.append(-1 if digit==2 else digit)
+        return positions
+
+    def successors(self,code):
+        positions = self.decode(code)
+        n,pow3 = self.n,self.pow3
+        for i,bun in enumerate(positions):
+            if bun==0:
                 continue
-            
-            for j in range(2): # simulate jumps 
-                jump = i+(bun)*(j+1)
-                if not(0<=jump<n) or self.positions[jump] == 0: 
-                    
-                    newState = self.positions.copy()
-                    newState[i]= 0
-                    if 0<=jump<n:
-                        newState[jump] = bun
-                    possibleStates.append(State(newState,parent =self,action=[bun,i,j+1,jump]))
-        return possibleStates
-
-    def printgenerateStatess(self):
-        states = self.generateStates()
-        for x in states:
-            print(x.positions)
-        print("")
-
-
-def BFS(initialState:State):
-    frontier = [initialState]
-    explored = set()
-    
-    while frontier:
-        curr_state = frontier.pop(0)    
-        if curr_state.isGoal():
-            print("Number of Valid Nodes Explored: ",len(explored))
-            return curr_state
-        explored.add(curr_state)
-        
-        possibleStates = curr_state.generateStates()
-        for state in possibleStates:
-            if (state not in explored) and (state not in frontier):
-                frontier.append(state)
-    print("Number of Valid Nodes Explored: ",len(explored))
-    return None
-def DFS(initialState:State):
-    frontier = [initialState]
-    explored = set()
-    
-    while frontier:
-        curr_state = frontier.pop()    
-        if curr_state.isGoal():
-            print("Number of Valid Nodes Explored: ",len(explored))
-            return curr_state
-        explored.add(curr_state)
-        
-        possibleStates = curr_state.generateStates()
-        for state in possibleStates:
-            if (state not in explored) and (state not in frontier):
-                frontier.append(state)
-    return None
-
-def solutionBFS(initialState:State):
-    
-    goal = BFS(initialState)
-    path = [goal]
-    if not goal:
-        return None
-    parent = goal.parent
-
-    while parent:
-        path.append(parent)
-        parent = parent.parent
-    while path:
-        state = path.pop()
-        
-        print(state.positions,state.action\
-            if state.action== "initial-state"\
-            else  f"{"East" if state.bun==1 else "West" }\
-            -facing rabbit at index {state.bun_ini} jumps\
-            {state.bun_steps} rocks to {state.bun_final \
-            if (0<=state.bun_final <len(state.positions)) else "destination"} index")
-
-def solutionDFS(initialState:State):
-    
-    goal = DFS(initialState)
-    path = [goal]
-    if not goal:
+            for steps in (1,2):
+                jump = i+bun*steps
+                if 0<=jump<n:
+                    if positions[jump]==0:
+                        yield code+(bun%3)*(pow3[jump]-pow3[i]),[bun,i,steps,jump],1
+                else:
+                    yield code-(bun%3)*pow3[i],[bun,i,steps,jump],1
+
+    def predecessors(self,code):
+        # reverse moves: a rabbit steps back against its direction, or re-enters from off the board
+        positions = self.decode(code)
+        n,pow3 = self.n,self.pow3
+        east,west = self.slack(positions)
+        for j,bun in enumerate(positions):
+            if bun==0:
+                continue
+            for steps in (1,2):
+                i = j-bun*steps
+                if 0<=i<n and positions[i]==0:
+                    # the rabbit now covers cells i..j-1 (east) or j+1..i (west) as well
+                    cells = east[i:j] if bun==1 else west[j+1:i+1]
+                    if min(cells)>0:
+                        yield code+(bun%3)*(pow3[i]-pow3[j]),[bun,i,steps,j],1
+        for bun,cover in ((1,east),(-1,west)):
+            for steps in (1,2):
+                for i in range(n):
+                    jump = i+bun*steps
+                    if 0<=jump<n or positions[i]!=0:
+                        continue
+                    cells = cover[i:] if bun==1 else cover[:i+1]
+                    if min(cells)>0:
+                        yield code+(bun%3)*pow3[i],[bun,i,steps,jump],1
+
+    def slack(self,positions):
+        # rabbits only move forward, so the east-facing rabbits left of any cell can never
+        # outnumber those the start had there (mirrored for west-facing ones).
+        # slack[i] is how many more rabbits the prefix (suffix for west) ending at i may take
+        n = self.n
+        start = self.start if self.start is not None else [0]*n
+        east,west = [0]*n,[0]*n
+        have = 0 if self.start is not None else n
+        for i in range(n):
+            have += (start[i]==1)-(positions[i]==1)
+            east[i] = have
+        have = 0 if self.start is not None else n
+        for i in range(n-1,-1,-1):
+            have += (start[i]==-1)-(positions[i]==-1)
+            west[i] = have
+        return east,west
+
+
+def describeMove(action,n):
+    bun,ini,steps,final = action
+    facing = "East" if bun==1 else "West"
+    dest = final if 0<=final<n else "destination"
+    return f"{facing}-facing rabbit at index {ini} jumps {steps} rocks to {dest} index"
+
+def solve(positions,method,*args):
+    board = Board(len(positions),positions)
+    engine = Engine(board)
+    path = engine.solve(method,board.encode(positions),*args)
+    print(engine.stats)
+    if path is None:
         return None
-    parent = goal.parent
-
-    while parent:
-        path.append(parent)
-        parent = parent.parent
-    while path:
-        state = path.pop()
-        
-        print(state.positions,state.action if state.action== "initial-state" else  f"{"East" if state.bun==1 else "West" }-facing rabbit at index {state.bun_ini} jumps{state.bun_steps} rocks to {state.bun_final if (0<=state.bun_final <len(state.positions)) else "destination"} index")
-def optimalBFS(initialState:State):
-    frontier = [initialState]
-    explored = set()
-
-    while frontier:
-        curr_state = frontier.pop(0)    
-        
-        if curr_state.isGoal():
-            print("Number of Valid Nodes Explored: ",len(explored))
-            return curr_state
-        explored.add(curr_state)
-        
-        possibleStates = curr_state.generateStates()
-        for state in possibleStates:
-            if (state not in explored) and (state not in frontier):
-                frontier.append(state)
-                
-                if state.shortest_path>curr_state.shortest_path+1:
-                    state.parent = curr_state
-                    state.shortest_path = curr_state.shortest_path+1
-  
-    return None
-def optimalBFSsolution(initialState:State):
-    goal = optimalBFS(initialState)
-    path = [goal]
-    solution  =0
-    if not goal:
+    return [(board.decode(code),action) for code,action in path]
+
+def printSolution(path):
+    if not path:
         return 'NOTHING'
-    parent = goal.parent
-
-    while parent:
-        path.append(parent)
-        parent = parent.parent
-        solution+=1
-    while path:
-        state = path.pop()
-        print(state.positions,state.action if state.action== "initial-state" else  f"{"East" if state.bun==1 else "West" }-facing rabbit at index {state.bun_ini} jumps {state.bun_steps} rocks to {state.bun_final if (0<=state.bun_final <len(state.positions)) else "destination"} index")
-    print(solution)
+    for state,action in path:
+        print(state,"initial-state" if action is None else describeMove(action,len(state)))
+    print(len(path)-1)
+
+def solutionBFS(positions):
+    printSolution(solve(positions,"BFS"))
+
+def solutionDFS(positions):
+    printSolution(solve(positions,"DFS"))
+
+def solutionIDDFS(positions):
+    printSolution(solve(positions,"IDDFS"))
+
+def bidirectionalBFSsolution(positions):
+    printSolution(solve(positions,"bidirectionalBFS",0))
+
+DENSE_VISITED = 1<<28
+
+def standardConfig(n):
+    # n stones: east-facing rabbits on the left, west-facing on the right, one or two free in the middle
+    k = (n-1)//2
+    return [1]*k+[0]*(n-2*k)+[-1]*k
+
+def decodeMoves(moves,n):
+    # move id = (i*2 + steps-1)*2 + (west-facing)
+    actions = []
+    for move in moves:
+        move = int(move)
+        west,move = move%2,move//2
+        i,steps = move//2,move%2+1
+        bun = -1 if west else 1
+        actions.append([bun,i,steps,i+bun*steps])
+    return actions
+
+def expandBatch(keys,n,span):
+    # all legal jumps of a whole layer at once; keys are owner*span + board code
+    pow3 = 3**np.arange(n,dtype=np.int64)
+    codes = keys%span
+    digits = (codes[:,None]//pow3[None,:])%3
+    parents,children,moves = [],[],[]
+    for i in range(n):
+        for steps in (1,2):
+            for digit,bun in ((1,1),(2,-1)):
+                jump = i+bun*steps
+                mask = digits[:,i]==digit
+                if 0<=jump<n:
+                    mask &= digits[:,jump]==0
+                    delta = digit*(pow3[jump]-pow3[i])
+                else:
+                    delta = -digit*pow3[i]
+                index = np.flatnonzero(mask)
+                parents.append(index)
+                children.append(keys[index]+delta)
+                moves.append(np.full(len(index),(i*2+steps-1)*2+(digit==2),dtype=np.int16))
+    return np.concatenate(parents),np.concatenate(children),np.concatenate(moves)
+
+def solveGroup(configs,n):
+    # BFS over every configuration of one board length together, each layer a NumPy array
+    span = 3**n
+    pow3 = 3**np.arange(n,dtype=np.int64)
+    starts = np.array([sum((bun%3)*int(p) for bun,p in zip(config,pow3)) for config in configs],dtype=np.int64)
+    keys = np.arange(len(configs),dtype=np.int64)*span+starts
+    layers = [(None,None)]    # per layer: index of each key's parent in the previous layer, move id
+    # a flat byte per possible key while that fits, a sorted key array otherwise
+    dense = len(configs)*span<=DENSE_VISITED
+    if dense:
+        visited = np.zeros(len(configs)*span,dtype=bool)
+        visited[keys] = True
+    else:
+        visited = np.unique(keys)
+    solutions = [None]*len(configs)
+
+    while len(keys):
+        owners = keys//span
+        done = keys%span==0
+        for j in np.flatnonzero(done):
+            owner,moves = owners[j],[]
+            for parent,move in reversed(layers[1:]):
+                moves.append(move[j])
+                j = parent[j]
+            solutions[owner] = decodeMoves(moves[::-1],n)
+        # configurations that reached the empty board stop expanding
+        active = np.flatnonzero(~np.isin(owners,owners[done]))
+        if not len(active):
+            break
+
+        parent,children,moves = expandBatch(keys[active],n,span)
+        children,first = np.unique(children,return_index=True)
+        parent,moves = active[parent[first]],moves[first]
+        new = ~visited[children] if dense else ~np.isin(children,visited,assume_unique=True)
+        keys = children[new]
+        layers.append((parent[new],moves[new]))
+        if dense:
+            visited[keys] = True
+        else:
+            visited = np.union1d(visited,keys)
+    return solutions
+
+def solveBatch(configs):
+    # optimal move lists ([bun,i,steps,jump] each) for every configuration, None if stuck
+    solutions = [None]*len(configs)
+    groups = {}
+    for index,config in enumerate(configs):
+        groups.setdefault(len(config),[]).append(index)
+    for n,indices in groups.items():
+        span = 3**n
+        if span>=2**62:
+            raise ValueError(f"boards of {n} stones do not fit a 64-bit key")
+        size = max(1,(2**62)//span)
+        for chunk in range(0,len(indices),size):
+            part = indices[chunk:chunk+size]
+            for index,moves in zip(part,solveGroup([configs[i] for i in part],n)):
+                solutions[index] = moves
+    return solutions
+
+def sweep(sizes=range(2,15)):
+    # the reachable space grows about 3x per stone, 14 stones take seconds
+    # and lengths near 20 are out of reach
+    configs = [standardConfig(n) for n in sizes]
+    return dict(zip(sizes,solveBatch(configs)))
+
 def main():
 
-    ini = eval(input("Initial-State: "))
-    initialState = State(ini) #[1,1,1,0,-1,-1,-1]
-    
-    # initialState.printgenerateStatess()
+    ini = eval(input("Initial-State: ")) #[1,1,1,0,-1,-1,-1]
+
     print("BFS ")
-    optimalBFSsolution(initialState)
+    solutionBFS(ini)
+    print("\nBidirectional BFS ")
+    bidirectionalBFSsolution(ini)
     print("\nDFS ")
-    solutionDFS(initialState)
+    solutionDFS(ini)
+    print("\nIDDFS ")
+    solutionIDDFS(ini)
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
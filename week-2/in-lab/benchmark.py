@@ -0,0 +1,105 @@
+import csv
+import io
+import os
+import random
+from multiprocessing import Pool
+
+FIELDS = ["depth", "trial", "seed", "time", "expanded", "generated", "memory", "length"]
+
+
+def run_trial(task):
+    # every trial reseeds from (seed, depth, trial), so an instance does not
+    # depend on which worker runs it or in what order
+    trial, args, depth, index, seed = task
+    trial_seed = f"{seed}-{depth}-{index}"
+    random.seed(trial_seed)
+    row = trial(*args, depth)
+    return {"depth": depth, "trial": index, "seed": trial_seed, **row}
+
+
+def load(path):
+    # rows already in a results file, ordered by (depth, trial); a last line
+    # cut short by an interrupted run is skipped
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, newline="") as file:
+        text = file.read()
+    rows = []
+    for row in csv.DictReader(io.StringIO(text[: text.rfind("\n") + 1])):
+        if None in row.values() or None in row:
+            continue
+        for field in ("depth", "trial", "expanded", "generated", "memory"):
+            row[field] = int(row[field])
+        row["time"] = float(row["time"])
+        row["length"] = int(row["length"]) if row["length"] else None
+        rows.append(row)
+    return sorted(rows, key=lambda row: (row["depth"], row["trial"]))
+
+
+def truncate(path):
+    # drop a partly written last line, so appended rows start on a line of their own
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as file:
+        data = file.read()
+        if data and not data.endswith(b"\n"):
+            file.truncate(data.rfind(b"\n") + 1)
+
+
+def run(trial, depths, trials=50, path=None, workers=None, seed=0, args=()):
+    # trial(*args, depth) runs one instance in a worker and returns the FIELDS
+    # after seed; rows are appended to the CSV at path as they finish, and a
+    # rerun only does the (depth, trial) pairs the file does not have yet
+    if path:
+        truncate(path)
+    done = {(row["depth"], row["trial"]) for row in load(path)}
+    tasks = [
+        (trial, args, depth, index, seed)
+        for depth in depths
+        for index in range(trials)
+        if (depth, index) not in done
+    ]
+    rows = []
+    file = None
+    if path:
+        new = not os.path.exists(path) or not os.path.getsize(path)
+        file = open(path, "a", newline="")
+        writer = csv.DictWriter(file, FIELDS)
+        if new:
+            writer.writeheader()
+    try:
+        with Pool(workers) as pool:
+            for row in pool.imap_unordered(run_trial, tasks, chunksize=max(1, len(tasks) // 1000)):
+                if file:
+                    writer.writerow(row)
+                    file.flush()
+                rows.append(row)
+    finally:
+        if file:
+            file.close()
+    if path:
+        return load(path)
+    return sorted(rows, key=lambda row: (row["depth"], row["trial"]))
+
+
+def summary(rows):
+    # per depth: (depth, mean time, mean memory, mean expansions)
+    depths = {}
+    for row in rows:
+        depths.setdefault(row["depth"], []).append(row)
+    for depth in sorted(depths):
+        group = depths[depth]
+        yield (
+            depth,
+            sum(row["time"] for row in group) / len(group),
+            sum(row["memory"] for row in group) / len(group),
+            sum(row["expanded"] for row in group) / len(group),
+        )
+
+
+def to_parquet(path, parquet_path=None):
+    import pandas as pd
+
+    parquet_path = parquet_path or os.path.splitext(path)[0] + ".parquet"
+    pd.DataFrame(load(path), columns=FIELDS).to_parquet(parquet_path, index=False)
+    return parquet_path
@@ -0,0 +1,136 @@
+import os
+import tempfile
+from math import isqrt
+
+import numpy as np
+
+from sliding_puzzle import puzzle
+
+PDB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdb")
+
+# disjoint tile groups, each database only counts moves of its own tiles so the
+# lookups can be added together and stay admissible
+PARTITIONS = {
+    3: [(1, 2, 3, 4), (5, 6, 7, 8)],
+    4: [(1, 2, 3, 5, 6), (4, 7, 8, 11, 12), (9, 10, 13, 14, 15)],
+}
+
+
+def neighbor_table(n):
+    # neighbor_table[cell] = 4 neighboring cells, -1 where the board ends
+    table = np.full((n * n, 4), -1, dtype=np.int64)
+    for i in range(n * n):
+        x, y = i // n, i % n
+        for d, (dx, dy) in enumerate([(-1, 0), (1, 0), (0, -1), (0, 1)]):
+            if 0 <= x + dx < n and 0 <= y + dy < n:
+                table[i, d] = (x + dx) * n + y + dy
+    return table
+
+
+def build(goal_state, tiles):
+    # 0-1 BFS backwards from the goal over (blank cell, cells of the pattern tiles);
+    # the index is blank + cells * (p_1 + cells * (p_2 + ...)), so the blank is the
+    # lowest digit. Moving the blank onto a cell no pattern tile occupies costs 0
+    n = isqrt(len(goal_state))
+    cells = n * n
+    k = len(tiles)
+    place = cells ** np.arange(k + 1, dtype=np.int64)
+    neighbors = neighbor_table(n)
+
+    dist = np.full(cells ** (k + 1), 255, dtype=np.uint8)
+    start = goal_state.index(0) + sum(goal_state.index(t) * int(place[i + 1]) for i, t in enumerate(tiles))
+    dist[start] = 0
+    frontier = np.array([start], dtype=np.int64)
+    cost = 0
+
+    while len(frontier):
+        layer = [frontier]
+        while len(frontier):
+            digits = (frontier[:, None] // place[None, :]) % cells
+            found = []
+            for d in range(4):
+                target = neighbors[digits[:, 0], d]
+                free = (target >= 0) & ~(digits[:, 1:] == target[:, None]).any(axis=1)
+                moved = frontier[free] + target[free] - digits[free, 0]
+                moved = np.unique(moved[dist[moved] == 255])
+                dist[moved] = cost
+                found.append(moved)
+            frontier = np.concatenate(found)
+            layer.append(frontier)
+
+        layer = np.concatenate(layer)
+        digits = (layer[:, None] // place[None, :]) % cells
+        found = []
+        for d in range(4):
+            target = neighbors[digits[:, 0], d]
+            hit = (digits[:, 1:] == target[:, None]) & (target >= 0)[:, None]
+            rows, tile = np.nonzero(hit)
+            # blank and the pattern tile trade places
+            blank = digits[rows, 0]
+            moved = layer[rows] + (target[rows] - blank) + (blank - target[rows]) * place[tile + 1]
+            moved = np.unique(moved[dist[moved] == 255])
+            dist[moved] = cost + 1
+            found.append(moved)
+        frontier = np.concatenate(found)
+        cost += 1
+
+    # the blank position is abstracted away: keep the best over all blank cells
+    return dist.reshape(cells ** k, cells).min(axis=1)
+
+
+def path_for(goal_state, tiles, directory=PDB_DIR):
+    n = isqrt(len(goal_state))
+    goal = "".join(f"{t:x}" for t in goal_state)
+    pattern = "".join(f"{t:x}" for t in tiles)
+    return os.path.join(directory, f"pdb{n}-{goal}-{pattern}.npy")
+
+
+def save(path, table):
+    # written to a temporary file in the same directory and renamed over path,
+    # so a reader never maps a half-written file and an interrupted build
+    # leaves nothing behind; concurrent builders just replace each other
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix=".npy.tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            np.save(file, table)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def load(goal_state, tiles, directory=PDB_DIR):
+    # built once and saved, every later load is a memory map of the file
+    path = path_for(goal_state, tiles, directory)
+    if not os.path.exists(path):
+        save(path, build(goal_state, tiles))
+    return np.load(path, mmap_mode="r")
+
+
+class PatternDatabase:
+    # additive disjoint pattern databases; an instance is a heuristic(key) for
+    # SlidingPuzzle keys and can be passed to Agent.Astar
+    def __init__(self, goal_state, partitions=None, directory=PDB_DIR) -> None:
+        n = isqrt(len(goal_state))
+        self.cells = n * n
+        problem = puzzle(goal_state)
+        self.bits, self.mask = problem.bits, problem.mask
+        self.partitions = partitions or PARTITIONS[n]
+        self.tables = [load(goal_state, tiles, directory) for tiles in self.partitions]
+        # memoryviews index the mapped files straight into python ints
+        self.lookup = [memoryview(table) for table in self.tables]
+
+    def __call__(self, key):
+        bits, mask = self.bits, self.mask
+        pos = [0] * self.cells
+        for i in range(self.cells):
+            pos[(key >> (bits * i)) & mask] = i
+        h = 0
+        for tiles, table in zip(self.partitions, self.lookup):
+            index = 0
+            for tile in reversed(tiles):
+                index = index * self.cells + pos[tile]
+            h += table[index]
+        return h
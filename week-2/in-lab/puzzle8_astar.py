@@ -1,112 +1,182 @@
-import heapq
 import random
 from time import time
+import os
 import sys
 
+import benchmark
+from sliding_puzzle import puzzle
+from puzzle8_oracle import oracle
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from search import Engine, SearchStats, measure
+
 default = [1, 2, 3, 4, 5, 6, 7, 8, 0]
 
 
 def heuristic(state, goal_state):
-    h = 0
-    for i in range(9):
-        if state.positions[i]:
-            goal_i = goal_state.index(state.positions[i])
-            h += abs(i // 3 - goal_i // 3) + abs(i % 3 - goal_i % 3)
-    return h
+    return puzzle(goal_state).heuristic(state.board)
 
 
 class State:
+    # any NxN board packed problem.bits per tile; h is computed once for a root and then
+    # updated incrementally from the moved tile for every successor
+    __slots__ = ("board", "blank", "g", "h", "parent", "problem")
+
     def __init__(self, positions, goal_state, parent=None, g=0) -> None:
-        self.positions = positions
+        self.problem = puzzle(goal_state)
+        self.board = self.problem.encode(positions)
+        self.blank = positions.index(0)
         self.parent = parent
         self.g = g
-        self.h = heuristic(self, goal_state)  # to goal
-        self.f = self.g + self.h
-        self.goal_state = goal_state
+        self.h = self.problem.heuristic(self.board)  # to goal
+
+    @property
+    def positions(self):
+        return self.problem.decode(self.board)
+
+    @property
+    def goal_state(self):
+        return self.problem.goal_state
+
+    @property
+    def f(self):
+        return self.g + self.h
 
     def getSuccessors(self):
         possible_states = []
-        index = self.positions.index(0)
-        x, y = index // 3, index % 3
-        moves = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-
-        for move in moves:
-            new_x, new_y = move[0] + x, move[1] + y
-            if 0 <= new_x < 3 and 0 <= new_y < 3:
-                ind = new_x * 3 + new_y
-                new_positions = list(self.positions)
-                new_positions[ind], new_positions[index] = (
-                    new_positions[index],
-                    new_positions[ind],
-                )
-                possible_states.append(
-                    State(new_positions, self.goal_state, self, self.g + 1)
-                )
+        for board, blank, _, h in self.problem.expand(self.board, self.h, self.blank):
+            state = State.__new__(State)
+            state.problem = self.problem
+            state.board = board
+            state.blank = blank
+            state.parent = self
+            state.g = self.g + 1
+            state.h = h
+            possible_states.append(state)
         return possible_states
 
     def isGoal(self):
-        return self.positions == self.goal_state
+        return self.board == self.problem.goal
 
     def __lt__(self, other):
-        return self.g < other.g
+        # by f, ties to the state nearer the goal
+        return (self.f, self.h) < (other.f, other.h)
 
     def __eq__(self, state):
-        return state.positions == self.positions
+        return state.board == self.board
 
     def __hash__(self) -> int:
-        return hash(tuple(self.positions))
+        return hash(self.board)
 
 
 class Agent:
-    def __init__(self) -> None:
+    def __init__(self, trace_memory=False) -> None:
+        # memory is the rise in RSS during a search, or with trace_memory what it
+        # allocated (tracemalloc), which also slows the search and its timing down
         self.memory = 0
+        self.stats = None
+        self.bounds = []
+        self.trace_memory = trace_memory
+
+    def search(self, method, initialState: State, *args, **kwargs):
+        problem = initialState.problem
+        engine = Engine(problem, trace_memory=self.trace_memory)
+        path = engine.solve(method, initialState.board, *args, **kwargs)
+        # print(engine.stats)
+        self.stats = engine.stats
+        self.memory = engine.stats.peak_memory
+        self.bounds = engine.bounds
+        if path is None:
+            return None
+        return [problem.decode(key) for key, _ in path]
+
+    def Astar(self, initialState: State, heuristic=None):
+        # heuristic(key) defaults to manhattan distance, e.g. PatternDatabase(goal)
+        return self.search("Astar", initialState, heuristic)
+
+    def weightedAstar(self, initialState: State, weight=2.0, heuristic=None):
+        # f = g + weight * h, the path is at most weight times the optimum
+        return self.search("Astar", initialState, heuristic, weight=weight)
+
+    def anytimeAstar(self, initialState: State, deadline=0.1, weight=3.0, step=0.5, heuristic=None, report=None):
+        # ARA*: a first path quickly, then better ones until deadline seconds;
+        # self.bounds holds (elapsed, length, bound, weight) for each path found
+        # and report(length, bound) is called as they come
+        return self.search("ARAstar", initialState, deadline, heuristic, weight, step, report)
+
+    def IDAstar(self, initialState: State, heuristic=None):
+        # iterative deepening on f = g + h over one mutable board, moved and
+        # unmoved in place; only the current path is kept, no explored set
+        problem = initialState.problem
+        board = initialState.positions
+        distance = problem.distance
+        bits = problem.bits
+        moves = []
+        self.stats = stats = SearchStats("IDAstar")
+        if not problem.solvable(initialState.board):
+            # no bound would ever reach the goal, so refuse before iterating
+            return None
+
+        def search(key, blank, g, h, bound, prev):
+            f = g + h
+            if f > bound:
+                return f
+            if key == problem.goal:
+                return True
+            stats.expanded += 1
+            stats.frontier(g + 1)
+            minimum = float("inf")
+            for ind in problem.neighbors[blank]:
+                if ind == prev:
+                    continue
+                stats.generated += 1
+                tile = board[ind]
+                board[blank], board[ind] = tile, 0
+                moves.append(ind)
+                new_key = key + (tile << (bits * blank)) - (tile << (bits * ind))
+                if heuristic is None:
+                    new_h = h + distance[tile][blank] - distance[tile][ind]
+                else:
+                    new_h = heuristic(new_key)
+                result = search(new_key, ind, g + 1, new_h, bound, blank)
+                if result is True:
+                    return True
+                moves.pop()
+                board[blank], board[ind] = 0, tile
+                minimum = min(minimum, result)
+            return minimum
+
+        with measure(self, trace_memory=self.trace_memory):
+            key = initialState.board
+            h = initialState.h if heuristic is None else heuristic(key)
+            bound = h
+            while True:
+                result = search(key, initialState.blank, 0, h, bound, None)
+                if result is True or result == float("inf"):
+                    break
+                bound = result
+        self.memory = stats.peak_memory
+        stats.solved = result is True
+        if not stats.solved:
+            return None
+        stats.depth = len(moves)
 
-    def Astar(self, initialState: State):
-        frontier = []
-        heapq.heappush(frontier, (initialState.g, initialState))
-        explored = set()
-
-        while frontier:
-            _, curr_state = heapq.heappop(frontier)
-            if curr_state in explored:
-                continue
-            explored.add(curr_state)
-            if curr_state.isGoal():
-                # print("Number of Valid Nodes Explored: ",len(explored))
-                state_size = sys.getsizeof(State([0] * 9, [0] * 9))
-                self.memory = len(frontier) * (state_size) + len(explored) * (
-                    state_size
-                )
-                return curr_state
-
-            possibleStates = curr_state.getSuccessors()
-            for state in possibleStates:
-                state.h = heuristic(state, initialState.goal_state)
-                state.f = state.g + state.h
-                heapq.heappush(frontier, (state.f, state))
-        # print("Number of Valid Nodes Explored: ",len(explored))
-
-        return None
+        board = initialState.positions
+        path = [list(board)]
+        for ind in moves:
+            blank = board.index(0)
+            board[blank], board[ind] = board[ind], 0
+            path.append(list(board))
+        return path
 
     def solutionAstar(self, initialState: State):
 
-        goal = self.Astar(initialState)
-        path = [goal]
-        if not goal:
+        path = self.Astar(initialState)
+        if not path:
+            print("No solution, the board is not solvable")
             return None
-        parent = goal.parent
-
-        while parent:
-            path.append(parent)
-            parent = parent.parent
-        while path:
-            state = path.pop()
-            arr = state.positions
-
-            for i in range(9):
-                print(arr[i] if arr[i] != 0 else "_", end="  ")
-                if (i + 1) % 3 == 0:
-                    print()
+        for arr in path:
+            initialState.problem.show(arr)
 
             print("\n")
 
@@ -122,44 +192,50 @@ def generate_config(initialState: State, d: int):
 
 
 def generate_config_diverse(initialState: State, d: int):
+    # random walk that never steps straight back to the previous board
     state = initialState
-    last_move = None
+    previous = None
     for _ in range(d):
         possible = state.getSuccessors()
-        if last_move is not None:
-            possible = [state for state in possible if state != last_move]
-        state = random.choice(possible)
-        last_move = state
-        state = random.choice(possible)
+        if previous is not None:
+            possible = [s for s in possible if s != previous]
+        previous, state = state, random.choice(possible)
 
     return state.positions
 
 
-def usage_analysis():
-    depths = [i for i in range(501)]
-    goal_state = State(default,default)
+def trial(d):
+    # one benchmark instance exactly d moves from the goal, run inside a benchmark worker
+    initial_state = State(oracle(default).sample(d), default)
 
+    search_agent = Agent()
+    start_time = time()
+    path = search_agent.Astar(initial_state)
+    end_time = time()
+
+    stats = search_agent.stats
+    return {
+        "time": end_time - start_time,
+        "expanded": stats.expanded,
+        "generated": stats.generated,
+        "memory": search_agent.memory,
+        "length": len(path) - 1 if path else None,
+    }
+
+
+def usage_analysis(results=None, workers=None, seed=0, depths=None, trials=50):
+    # results: CSV file the per-instance rows go to (and are resumed from);
+    # depths are optimal solution lengths, by default every one a board has.
+    # The oracle file is built here, before the workers start mapping it
+    distance_oracle = oracle(default)
+    if depths is None:
+        depths = distance_oracle.depths()
     print("---------------------------USAGE ANALYSIS--------------------")
     print("depth\t| time\t|memory\t")
-    for d in depths:
-        time_taken = 0
-        memory = 0
-
-        for _ in range(50):
-            initial_state = State(generate_config(goal_state, d),default)
-
-            start_time = time()
-            search_agent = Agent()
-            search_agent.Astar(initial_state)
-            end_time = time()
-
-            time_taken += end_time - start_time
-            memory += search_agent.memory
-
-        time_taken /= 50
-        memory = memory / 50
+    rows = benchmark.run(trial, depths, trials, results, workers, seed)
 
-        print(d, time_taken, memory,sep="\t")
+    for d, time_taken, memory, _ in benchmark.summary(rows):
+        print(d, time_taken, memory, sep="\t")
 
 
 def main():
@@ -1,31 +1,36 @@
-from collections import deque
+from math import isqrt
 import numpy as np
 import random
 from time import time
+import os
 import sys
 
+import benchmark
+from sliding_puzzle import goal_for, puzzle
+from puzzle8_oracle import oracle
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from search import Engine
+
 class State: 
+    # any NxN board, the goal is the tiles in order with the blank last
     def __init__(self,positions, parent = None) -> None:
         self.positions = positions
         self.parent = parent
+        self.problem = puzzle(goal_for(isqrt(len(positions))))
 
     def getSuccessors(self):
         possible_states = []
         index = self.positions.index(0)
-        x,y = index//3, index%3
-        moves = [(-1,0),(1,0),(0,-1),(0,1)]
         
-        for move in moves:
-            new_x,new_y = move[0]+x,move[1]+y
-            if 0<=new_x<3 and 0<=new_y<3:
-                ind = new_x*3 + new_y
-                new_positions = list(self.positions)
-                new_positions[ind],new_positions[index] = new_positions[index],new_positions[ind]
-                possible_states.append(State(new_positions,self))
+        for ind in self.problem.neighbors[index]:
+            new_positions = list(self.positions)
+            new_positions[ind],new_positions[index] = new_positions[index],new_positions[ind]
+            possible_states.append(State(new_positions,self))
         return possible_states
     
     def isGoal(self):
-        return self.positions == [1,2,3,4,5,6,7,8,0]
+        return self.positions == self.problem.goal_state
 
         
     def __eq__(self,state):
@@ -36,52 +41,52 @@ class State:
 
 
 class Agent:
-    def __init__(self) -> None:
+    def __init__(self,trace_memory=False) -> None:
+        # memory is the rise in RSS during a search, or with trace_memory what it
+        # allocated (tracemalloc), which also slows the search and its timing down
         self.memory = 0
+        self.stats = None
+        self.trace_memory = trace_memory
+
+    def search(self,problem,method,initialState:State,*args,trace_memory=None):
+        # unsolvable boards are turned away by the engine before any search
+        if trace_memory is None:
+            trace_memory = self.trace_memory
+        engine = Engine(problem,trace_memory=trace_memory)
+        path = engine.solve(method,problem.encode(initialState.positions),*args)
+        # print(engine.stats)
+        self.stats = engine.stats
+        self.memory = engine.stats.peak_memory
+        if path is None:
+            return None
+        return [problem.decode(key) for key,_ in path]
 
     def BFS(self,initialState:State):
-        frontier = deque([initialState])
-        explored = set()
-        
-        while frontier:
-            curr_state = frontier.popleft()
-            if curr_state in explored:
-                continue
-            explored.add(curr_state)
-            if curr_state.isGoal():
-                # print("Number of Valid Nodes Explored: ",len(explored))
-                state_size = sys.getsizeof(State([0]*9))
-                self.memory = len(frontier)*(state_size)+ len(explored)*(state_size)
-                return curr_state
-            
-            possibleStates = curr_state.getSuccessors()
-            for state in possibleStates:
-                if (state not in explored) and (state not in frontier):
-                    frontier.append(state)
-        # print("Number of Valid Nodes Explored: ",len(explored))
-
-        return None
+        return self.search(initialState.problem,"BFS",initialState)
+
+
+    def bidirectionalBFS(self,initialState:State):
+        # grows the smaller of the start and goal frontiers each round
+        problem = initialState.problem
+        return self.search(problem,"bidirectionalBFS",initialState,problem.goal)
+
+    def oracle(self,initialState:State):
+        # optimal path read off the precomputed distance table, no search
+        if initialState.problem.cells != 9:
+            raise ValueError("the distance table only covers the 3x3 board")
+        distance_oracle = oracle()
+        # no tracemalloc here, starting it would cost more than the lookups
+        return self.search(distance_oracle.problem,"descend",initialState,distance_oracle.distance,trace_memory=False)
 
 
     def solutionBFS(self,initialState:State):
         
-        goal = self.BFS(initialState)
-        path = [goal]
-        if not goal:
+        path = self.BFS(initialState)
+        if not path:
+            print("No solution, the board is not solvable")
             return None
-        parent = goal.parent
-
-        while parent:
-            path.append(parent)
-            parent = parent.parent
-        while path:
-            state = path.pop()
-            arr = state.positions
-            
-            for i in range(9):
-                print(arr[i] if arr[i]!=0 else "_",end="  ")
-                if(i+1)%3 ==0:
-                    print()
+        for arr in path:
+            initialState.problem.show(arr)
 
             print("\n")
 
@@ -96,30 +101,31 @@ def generate_config(initialState:State,d:int):
     
     return state.positions
 
-def usage_analysis():
-    depths = [i for i in range(501)] 
+def trial(mode,d):
+    # one benchmark instance exactly d moves from the goal, run inside a benchmark worker
+    initial_state = State(oracle().sample(d))
+
+    search_agent = Agent()
+    start_time = time()
+    path = getattr(search_agent,mode)(initial_state)
+    end_time = time()
+
+    stats = search_agent.stats
+    return {"time":end_time-start_time,"expanded":stats.expanded,"generated":stats.generated,
+            "memory":search_agent.memory,"length":len(path)-1 if path else None}
+
+def usage_analysis(mode="BFS",results=None,workers=None,seed=0,depths=None,trials=50):
+    # results: CSV file the per-instance rows go to (and are resumed from);
+    # depths are optimal solution lengths, by default every one a board has.
+    # The oracle file is built here, before the workers start mapping it
+    distance_oracle = oracle()
+    if depths is None:
+        depths = distance_oracle.depths()
     print("---------------------------USAGE ANALYSIS--------------------")
     print("depth\t| time\t|memory\t")
-    goal_state = State([1, 2, 3, 4, 5, 6, 7, 8, 0])
-
-    for d in depths:
-        time_taken = 0
-        memory = 0
-
-        for i in range(50):
-            initial_state = State(generate_config(goal_state,d))
+    rows = benchmark.run(trial,depths,trials,results,workers,seed,args=(mode,))
 
-            start_time = time()
-            search_agent = Agent()
-            search_agent.BFS(initial_state)
-            end_time = time()
-
-            time_taken+=end_time - start_time
-            memory+=search_agent.memory
-        
-        time_taken/=50
-        memory = memory/50
-        
+    for d,time_taken,memory,_ in benchmark.summary(rows):
         print(d, time_taken, memory,sep="\t")
         
 def main():
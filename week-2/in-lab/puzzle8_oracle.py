@@ -0,0 +1,106 @@
+import os
+import random
+from collections import deque
+from math import factorial
+
+import numpy as np
+
+from pattern_db import PDB_DIR, save
+from sliding_puzzle import SlidingPuzzle, default
+
+UNSOLVABLE = 255
+FACTORIAL = [factorial(i) for i in range(17)]
+
+
+def rank(positions):
+    # lexicographic index of a permutation of 0..n-1 (Lehmer code)
+    n = len(positions)
+    r = 0
+    for i in range(n - 1):
+        tile = positions[i]
+        smaller = 0
+        for other in positions[i + 1:]:
+            if other < tile:
+                smaller += 1
+        r += smaller * FACTORIAL[n - 1 - i]
+    return r
+
+
+def unrank(r, n=9):
+    items = list(range(n))
+    positions = []
+    for i in range(n - 1, -1, -1):
+        index, r = divmod(r, FACTORIAL[i])
+        positions.append(items.pop(index))
+    return positions
+
+
+def build(goal_state=default):
+    # retrograde BFS from the goal over all 181,440 solvable boards
+    problem = SlidingPuzzle(goal_state)
+    if problem.cells != 9:
+        raise ValueError("the distance table is only practical for the 3x3 board")
+    table = bytearray([UNSOLVABLE]) * factorial(9)
+    table[rank(goal_state)] = 0
+    frontier = deque([(problem.goal, 0)])
+    while frontier:
+        key, d = frontier.popleft()
+        for next_key, _, _ in problem.successors(key):
+            r = rank(problem.decode(next_key))
+            if table[r] == UNSOLVABLE:
+                table[r] = d + 1
+                frontier.append((next_key, d + 1))
+    return np.frombuffer(table, dtype=np.uint8)
+
+
+class DistanceOracle:
+    # exact distance to the goal for every 8-puzzle board, memory-mapped from disk
+    def __init__(self, goal_state=default, directory=PDB_DIR) -> None:
+        self.problem = SlidingPuzzle(goal_state)
+        goal = "".join(str(t) for t in goal_state)
+        path = os.path.join(directory, f"oracle3-{goal}.npy")
+        if not os.path.exists(path):
+            save(path, build(goal_state))
+        self.table = np.load(path, mmap_mode="r")
+        self.lookup = memoryview(self.table)
+        self.order = None
+
+    def strata(self):
+        # ranks grouped by distance: order[offsets[d]:offsets[d + 1]] are the
+        # boards exactly d moves from the goal, built on first use
+        if self.order is None:
+            counts = np.bincount(self.table, minlength=UNSOLVABLE + 1)[:UNSOLVABLE]
+            self.max_depth = int(np.flatnonzero(counts)[-1])
+            self.counts = counts[: self.max_depth + 1]
+            self.offsets = np.concatenate(([0], np.cumsum(self.counts)))
+            self.order = np.argsort(self.table, kind="stable")
+        return self.order
+
+    def depths(self):
+        # every optimal solution length some board has
+        self.strata()
+        return range(self.max_depth + 1)
+
+    def sample(self, depth, rng=random):
+        # a uniformly random board whose optimal solution is exactly depth moves
+        order = self.strata()
+        if not 0 <= depth <= self.max_depth:
+            raise ValueError(f"no 8-puzzle board is {depth} moves from the goal, the most is {self.max_depth}")
+        r = int(order[self.offsets[depth] + rng.randrange(int(self.counts[depth]))])
+        return unrank(r)
+
+    def distance(self, key):
+        # SlidingPuzzle key -> moves to the goal, None for unsolvable boards
+        d = self.lookup[rank(self.problem.decode(key))]
+        return None if d == UNSOLVABLE else d
+
+
+oracles = {}
+
+
+def oracle(goal_state=default):
+    # one DistanceOracle per goal and process
+    goal = tuple(goal_state)
+    if goal not in oracles:
+        oracles[goal] = DistanceOracle(goal_state)
+    return oracles[goal]
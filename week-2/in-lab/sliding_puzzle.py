@@ -0,0 +1,129 @@
+from math import isqrt
+
+default = [1, 2, 3, 4, 5, 6, 7, 8, 0]
+
+
+def goal_for(n):
+    # tiles in order with the blank in the last cell
+    return list(range(1, n * n)) + [0]
+
+
+class SlidingPuzzle:
+    # search problem for NxN boards, keys pack cell i into bits*i.. with bits
+    # wide enough for the largest tile (4 up to 4x4, 5 up to 5x5, ...)
+    def __init__(self, goal_state=default) -> None:
+        n = self.size = isqrt(len(goal_state))
+        self.cells = n * n
+        if self.cells != len(goal_state) or sorted(goal_state) != list(range(self.cells)):
+            raise ValueError("goal state must be a permutation of 0..n*n-1 for an NxN board")
+        self.bits = max(4, (self.cells - 1).bit_length())
+        self.mask = (1 << self.bits) - 1
+        self.goal_state = list(goal_state)
+        self.goal = self.encode(goal_state)
+        self.goal_pos = [0] * self.cells
+        for i, tile in enumerate(goal_state):
+            self.goal_pos[tile] = i
+        # distance[tile][cell] = manhattan distance of tile at cell from its goal cell
+        self.distance = [
+            [abs(i // n - goal_i // n) + abs(i % n - goal_i % n) if tile else 0 for i in range(self.cells)]
+            for tile, goal_i in enumerate(self.goal_pos)
+        ]
+        self.neighbors = []
+        for i in range(self.cells):
+            x, y = i // n, i % n
+            moves = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+            self.neighbors.append(
+                [(x + dx) * n + y + dy for dx, dy in moves if 0 <= x + dx < n and 0 <= y + dy < n]
+            )
+
+    def encode(self, positions) -> int:
+        key = 0
+        for i, tile in enumerate(positions):
+            key |= tile << (self.bits * i)
+        return key
+
+    def decode(self, key):
+        bits, mask = self.bits, self.mask
+        return [(key >> (bits * i)) & mask for i in range(self.cells)]
+
+    def blank(self, key):
+        bits, mask = self.bits, self.mask
+        for i in range(self.cells):
+            if not (key >> (bits * i)) & mask:
+                return i
+
+    def solvable(self, key):
+        # a slide swaps the blank with a neighbor: one transposition of the
+        # board permutation and one step of blank travel, so the permutation
+        # parity relative to the goal always equals the parity of the blank's
+        # manhattan distance from its goal cell. Cycle counting keeps it O(N^2)
+        positions = self.decode(key) if isinstance(key, int) else key
+        if len(positions) != self.cells or set(positions) != set(range(self.cells)):
+            return False
+        goal_pos = self.goal_pos
+        seen = [False] * self.cells
+        cycles = 0
+        for i in range(self.cells):
+            if not seen[i]:
+                cycles += 1
+                while not seen[i]:
+                    seen[i] = True
+                    i = goal_pos[positions[i]]
+        n = self.size
+        blank, goal_blank = positions.index(0), goal_pos[0]
+        travel = abs(blank // n - goal_blank // n) + abs(blank % n - goal_blank % n)
+        return (self.cells - cycles) % 2 == travel % 2
+
+    def is_goal(self, key):
+        return key == self.goal
+
+    def successors(self, key):
+        # action = cell the blank moves to
+        bits, mask = self.bits, self.mask
+        blank = self.blank(key)
+        for ind in self.neighbors[blank]:
+            tile = (key >> (bits * ind)) & mask
+            yield key + (tile << (bits * blank)) - (tile << (bits * ind)), ind, 1
+
+    def predecessors(self, key):
+        # every slide can be slid back; the action of prev -> key is the cell
+        # the blank moved to, which is where it sits in key
+        bits, mask = self.bits, self.mask
+        blank = self.blank(key)
+        for ind in self.neighbors[blank]:
+            tile = (key >> (bits * ind)) & mask
+            yield key + (tile << (bits * blank)) - (tile << (bits * ind)), blank, 1
+
+    def expand(self, key, h, blank=None):
+        # successors with the heuristic updated from the single moved tile
+        bits, mask = self.bits, self.mask
+        if blank is None:
+            blank = self.blank(key)
+        for ind in self.neighbors[blank]:
+            tile = (key >> (bits * ind)) & mask
+            distance = self.distance[tile]
+            yield key + (tile << (bits * blank)) - (tile << (bits * ind)), ind, 1, h + distance[blank] - distance[ind]
+
+    def heuristic(self, key):
+        # manhattan distance
+        bits, mask = self.bits, self.mask
+        h = 0
+        for i in range(self.cells):
+            h += self.distance[(key >> (bits * i)) & mask][i]
+        return h
+
+    def show(self, positions):
+        width = len(str(self.cells - 1))
+        for i in range(0, self.cells, self.size):
+            print("  ".join(str(t).rjust(width) if t else "_".rjust(width) for t in positions[i:i + self.size]))
+
+
+problems = {}
+
+
+def puzzle(goal_state):
+    # one SlidingPuzzle (goal-position and distance tables) shared per goal
+    goal = tuple(goal_state)
+    if goal not in problems:
+        problems[goal] = SlidingPuzzle(goal_state)
+    return problems[goal]
@@ -0,0 +1,336 @@
+"""
+Sentence alignment by dynamic programming.
+
+Aligning text1 against text2 either pairs sentence i with sentence j at cost
+distance(text1[i], text2[j]) or skips one sentence at cost 1, the same moves
+the A* agent searches. cost[i][j] = min(cost[i-1][j-1] + sub, cost[i-1][j] + 1,
+cost[i][j-1] + 1), computed one row at a time so only O(m) numbers are live.
+
+Two skips cost 2, so pairing two sentences only ever helps when they are at
+most one edit apart; distances are capped at 2 (near()), which is decided
+by a comparison of the word lists instead of a full edit distance.
+
+Every skip moves the path one diagonal (j - i) away, so an alignment costing
+D never leaves the diagonals within D of 0 and m - n. align() first runs the
+diagonal (Ukkonen/Myers) form of the recurrence: for cost d = 0, 1, ... it
+keeps the furthest row reached on each diagonal and slides along runs of
+identical sentences for free, so near-copies cost about O(n + m + D^2) work
+and O(D^2) memory.
+
+Past limit layers, only pairs with sub < 2 matter, and with near() those
+share a hash: the whole sentence, the sentence minus one word, or (k, the
+sentence minus word k). matches() finds them by sorting those keys, and
+sparse() takes the heaviest chain of them increasing in both texts: about
+O(words * sentence length + r log m) for r match points, so unrelated
+documents cost no more than near-copies.
+
+Other distances, or texts where too many pairs share a key (SPARSE_PAIRS),
+fall back to the row DP restricted to a band that doubles until the cost
+fits, recovering the pairs with Hirschberg's divide and conquer. Every level
+of the recursion rescans the band, so that is O((n + m) * D * log n)
+distance calls in O(n + m) space; blocks up to SMALL_CELLS cells are solved
+with one full table, which cuts the deepest levels.
+"""
+from array import array
+
+import numpy as np
+
+INF = float("inf")
+# hirschberg() solves blocks this small directly instead of splitting them
+SMALL_CELLS = 1 << 12
+# candidate pairs sharing a key beyond which sparse alignment gives up
+SPARSE_PAIRS = 1 << 22
+
+
+def near(s1, s2):
+    # min(levenshtein distance, 2) of two word lists
+    if s1 == s2:
+        return 0
+    n, m = len(s1), len(s2)
+    if n < m:
+        s1, s2, n, m = s2, s1, m, n
+    if n - m > 1:
+        return 2
+    i = 0
+    while i < m and s1[i] == s2[i]:
+        i += 1
+    # one substitution, or one extra word in the longer list
+    if n == m:
+        return 1 if s1[i + 1:] == s2[i + 1:] else 2
+    return 1 if s1[i + 1:] == s2[i:] else 2
+
+
+def last_row(n, m, sub, dlo, dhi):
+    # row[j] = cost of aligning the first n items with the first j items,
+    # using only cells with dlo <= j - i <= dhi. Rows are stored by diagonal,
+    # cell (i, j) at k = j - i - dlo: up is k + 1 in prev, left k - 1, diagonal k
+    width = dhi - dlo + 1
+    prev = [INF] * (width + 1)
+    for j in range(max(0, dlo), min(m, dhi) + 1):
+        prev[j - dlo] = j
+    for i in range(1, n + 1):
+        cur = [INF] * (width + 1)
+        for j in range(max(0, i + dlo), min(m, i + dhi) + 1):
+            k = j - i - dlo
+            c = prev[k + 1] + 1
+            if j:
+                left = cur[k - 1] + 1 if k else INF
+                diagonal = prev[k] + sub(i - 1, j - 1)
+                if left < c:
+                    c = left
+                if diagonal < c:
+                    c = diagonal
+            cur[k] = c
+        prev = cur
+    row = [INF] * (m + 1)
+    for j in range(max(0, n + dlo), min(m, n + dhi) + 1):
+        row[j] = prev[j - n - dlo]
+    return row
+
+
+def step(prev, d, k, n, m, sub):
+    # row on diagonal k reached at cost d before sliding, and the move:
+    # "pair" from (x - 1, x - 1 + k), "skip2" from diagonal k - 1 (text2
+    # sentence skipped), "skip1" from diagonal k + 1 (text1 sentence skipped);
+    # prev holds layer d - 1 at index k + d - 1, -1 where nothing arrived
+    best, move = -1, None
+    if -d < k < d:
+        x = prev[k + d - 1]
+        if 0 <= x < n and x + k < m and sub(x, x + k) < 2:
+            best, move = x + 1, "pair"
+    if k - 1 >= -d + 1:
+        x = prev[k + d - 2]
+        if x > best and x + k <= m:
+            best, move = x, "skip2"
+    if k + 1 <= d - 1:
+        x = prev[k + d]
+        if x >= 0 and x + 1 > best and x + 1 <= n:
+            best, move = x + 1, "skip1"
+    return best, move
+
+
+def diagonals(text1, text2, sub, limit):
+    # -> (cost, pairs), or None when the cost exceeds limit
+    n, m = len(text1), len(text2)
+    ids = {}
+    a = [ids.setdefault(tuple(s), len(ids)) for s in text1]
+    b = [ids.setdefault(tuple(s), len(ids)) for s in text2]
+
+    def slide(x, k):
+        while x < n and x + k < m and a[x] == b[x + k]:
+            x += 1
+        return x
+
+    layers = [array("i", [slide(0, 0)])]
+    d = 0
+    while not (-d <= m - n <= d and layers[d][m - n + d] == n):
+        d += 1
+        if d > limit:
+            return None
+        prev = layers[-1]
+        layer = array("i", [-1]) * (2 * d + 1)
+        for k in range(max(-d, -n), min(d, m) + 1):
+            x, _ = step(prev, d, k, n, m, sub)
+            if x >= 0:
+                layer[k + d] = slide(x, k)
+        layers.append(layer)
+
+    cost = d
+    steps = []
+    x, k = n, m - n
+    for d in range(cost, -1, -1):
+        start, move = step(layers[d - 1], d, k, n, m, sub) if d else (0, None)
+        steps.extend((i, i + k) for i in range(x - 1, start - 1, -1))
+        if move == "pair":
+            x = start - 1
+            steps.append((x, x + k))
+        elif move == "skip2":
+            x, k = start, k - 1
+            steps.append((None, x + k))
+        elif move == "skip1":
+            x, k = start - 1, k + 1
+            steps.append((x, None))
+    steps.reverse()
+    return cost, steps
+
+
+def keys(sentence):
+    # hashes two sentences at most one edit apart have in common: the whole
+    # sentence (equal), the sentence minus one word (== the other whole, one
+    # word inserted) and (k, sentence minus word k) (word k substituted)
+    words = tuple(sentence)
+    found = {hash(words)}
+    for k in range(len(words)):
+        rest = words[:k] + words[k + 1:]
+        found.add(hash(rest))
+        found.add(hash((k, rest)))
+    return found
+
+
+def matches(text1, text2, sub, cap):
+    # -> [(i, j, sub)] for every pair with sub < 2 in row-major order, or
+    # None when more than cap candidate pairs share a key
+    n, m = len(text1), len(text2)
+    owners, hashes = [], []
+    for j, sentence in enumerate(text2):
+        found = keys(sentence)
+        owners.extend([j] * len(found))
+        hashes.extend(found)
+    hashes2 = np.array(hashes, dtype=np.int64)
+    owners2 = np.array(owners, dtype=np.int64)
+    order = np.argsort(hashes2, kind="stable")
+    hashes2, owners2 = hashes2[order], owners2[order]
+
+    owners, hashes = [], []
+    for i, sentence in enumerate(text1):
+        found = keys(sentence)
+        owners.extend([i] * len(found))
+        hashes.extend(found)
+    hashes1 = np.array(hashes, dtype=np.int64)
+    owners1 = np.array(owners, dtype=np.int64)
+    starts = np.searchsorted(hashes2, hashes1, "left")
+    lengths = np.searchsorted(hashes2, hashes1, "right") - starts
+    if int(lengths.sum()) > cap:
+        return None
+    ends = np.cumsum(lengths)
+    index = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - (ends - lengths), lengths)
+    candidates = np.unique(np.repeat(owners1, lengths) * m + owners2[index])
+    found = []
+    for pair in candidates.tolist():
+        i, j = divmod(pair, m)
+        cost = sub(i, j)
+        if cost < 2:
+            found.append((i, j, cost))
+    return found
+
+
+def sparse(n, m, points):
+    # -> (cost, pairs). Pairing costs sub and two skips cost 2, so the cost is
+    # n + m minus the heaviest chain of points increasing in i and j, each
+    # weighing 2 - sub. Rows in order, a Fenwick tree over j holds the
+    # heaviest chain ending before each column; a row's updates wait until
+    # all its queries are done so a chain takes at most one point per row
+    tree = [(0, -1)] * (m + 1)
+    best = [(0, -1)] * len(points)
+    row = 0
+    while row < len(points):
+        end = row
+        while end < len(points) and points[end][0] == points[row][0]:
+            end += 1
+        for p in range(row, end):
+            j = points[p][1]
+            weight, before = 0, -1
+            while j > 0:
+                if tree[j][0] > weight:
+                    weight, before = tree[j]
+                j -= j & -j
+            best[p] = (weight + 2 - points[p][2], before)
+        for p in range(row, end):
+            j = points[p][1] + 1
+            while j <= m:
+                if best[p][0] > tree[j][0]:
+                    tree[j] = (best[p][0], p)
+                j += j & -j
+        row = end
+
+    last = max(range(len(points)), key=lambda p: best[p][0], default=-1)
+    chain = []
+    while last >= 0:
+        chain.append(points[last])
+        last = best[last][1]
+    chain.reverse()
+
+    pairs = []
+    i = j = 0
+    for pi, pj, _ in chain + [(n, m, 0)]:
+        pairs.extend((x, None) for x in range(i, pi))
+        pairs.extend((None, y) for y in range(j, pj))
+        if pi < n:
+            pairs.append((pi, pj))
+        i, j = pi + 1, pj + 1
+    return n + m - sum(2 - cost for _, _, cost in chain), pairs
+
+
+def small(i0, i1, j0, j1, sub, dlo, dhi, pairs):
+    # full table with traceback, for blocks of at most SMALL_CELLS cells
+    n, m = i1 - i0, j1 - j0
+    cost = [[INF] * (m + 1) for _ in range(n + 1)]
+    for i in range(n + 1):
+        for j in range(m + 1):
+            if not dlo <= (j0 + j) - (i0 + i) <= dhi:
+                continue
+            if not i and not j:
+                cost[i][j] = 0
+                continue
+            c = INF
+            if i:
+                c = cost[i - 1][j] + 1
+            if j:
+                c = min(c, cost[i][j - 1] + 1)
+            if i and j:
+                c = min(c, cost[i - 1][j - 1] + sub(i0 + i - 1, j0 + j - 1))
+            cost[i][j] = c
+    steps = []
+    i, j = n, m
+    while i or j:
+        # a pair costing 2 is as good as two skips, report those as skips
+        pair = sub(i0 + i - 1, j0 + j - 1) if i and j else 2
+        if pair < 2 and cost[i][j] == cost[i - 1][j - 1] + pair:
+            i, j = i - 1, j - 1
+            steps.append((i0 + i, j0 + j))
+        elif i and cost[i][j] == cost[i - 1][j] + 1:
+            i -= 1
+            steps.append((i0 + i, None))
+        else:
+            j -= 1
+            steps.append((None, j0 + j))
+    pairs.extend(reversed(steps))
+
+
+def hirschberg(i0, i1, j0, j1, sub, dlo, dhi, pairs):
+    # split text1 in half, find where the optimal path crosses the middle row
+    # from a forward and a backward pass, and solve the two corners
+    if i1 - i0 <= 1 or (i1 - i0 + 1) * (j1 - j0 + 1) <= SMALL_CELLS:
+        small(i0, i1, j0, j1, sub, dlo, dhi, pairs)
+        return
+    mid = (i0 + i1) // 2
+    shift = j0 - i0
+    forward = last_row(mid - i0, j1 - j0, lambda i, j: sub(i0 + i, j0 + j), dlo - shift, dhi - shift)
+    shift = j1 - i1
+    backward = last_row(i1 - mid, j1 - j0, lambda i, j: sub(i1 - 1 - i, j1 - 1 - j), shift - dhi, shift - dlo)
+    split = min(range(j1 - j0 + 1), key=lambda j: forward[j] + backward[j1 - j0 - j])
+    hirschberg(i0, mid, j0, j0 + split, sub, dlo, dhi, pairs)
+    hirschberg(mid, i1, j0 + split, j1, sub, dlo, dhi, pairs)
+
+
+def align(text1, text2, distance=near, band=8, limit=64):
+    # -> (cost, pairs); pairs lists the alignment in order as (i, j) for
+    # sentences paired with each other, (i, None) / (None, j) for skipped ones.
+    # Any distance works, only min(distance, 2) matters
+    n, m = len(text1), len(text2)
+
+    if distance is near:
+        def sub(i, j):
+            return near(text1[i], text2[j])
+    else:
+        def sub(i, j):
+            return min(distance(text1[i], text2[j]), 2)
+
+    found = diagonals(text1, text2, sub, limit)
+    if found is not None:
+        return found
+    if distance is near:
+        points = matches(text1, text2, sub, SPARSE_PAIRS)
+        if points is not None:
+            return sparse(n, m, points)
+    band = max(1, band)
+    while True:
+        dlo, dhi = min(0, m - n) - band, max(0, m - n) + band
+        cost = last_row(n, m, sub, dlo, dhi)[m]
+        # cheaper than band: no path outside the band could have beaten it
+        if cost <= band or band >= n + m:
+            break
+        band *= 2
+    pairs = []
+    hirschberg(0, n, 0, m, sub, dlo, dhi, pairs)
+    return cost, pairs
@@ -0,0 +1,227 @@
+"""
+Scaling benchmark for detect_plagiarism.
+
+    python benchmark.py run RESULTS.jsonl [--sizes ...] [--overlaps ...]
+    python benchmark.py compare OLD.jsonl NEW.jsonl
+
+Each case synthesizes a pair of documents of the same number of sentences:
+file2 copies a fraction (overlap) of file1's sentences in order, some with a
+word or two substituted, and fills the rest with fresh sentences. Words are
+drawn from a Zipf-like vocabulary so sentences share common words the way
+prose does. The stages of detect_plagiarism are timed separately:
+    preprocess   both files read into interned sentence ids
+    alignment    Agent.DP
+    scoring      score_pairs, every pair or (with prune) the candidates
+Every case runs in a fresh process and is cut off after timeout seconds;
+the stages it did not finish are recorded with status "timeout". Stages are
+measured with search.measure: the peak is how far the RSS rose during the
+stage, or with trace_memory what the stage allocated (tracemalloc), which
+slows it down.
+
+Results are one JSON object per (case, stage) line, labelled so runs of
+different releases can be appended to one file or compared side by side.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+from multiprocessing import Process, Queue
+from queue import Empty
+from time import perf_counter
+
+from plagiarism_check import Agent, score_pairs
+from kernels import bit_parallel
+from tokens import DistanceCache, Vocabulary
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from search import SearchStats, measure
+
+SIZES = [10, 100, 1000, 10000, 100000]
+OVERLAPS = [0.0, 0.5, 0.9, 1.0]
+STAGES = ["preprocess", "alignment", "scoring"]
+WORDS = 5000
+
+
+def synthesize(sentences, overlap, rng):
+    # -> (text1, text2) as lists of lines
+    population = [f"w{k}" for k in range(WORDS)]
+    weights = [1 / (k + 1) for k in range(WORDS)]
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    def sentence():
+        return rng.choices(population, cum_weights=cumulative, k=rng.randint(5, 20))
+
+    text1 = [sentence() for _ in range(sentences)]
+    text2 = []
+    for words in text1:
+        if rng.random() < overlap:
+            words = list(words)
+            for _ in range(rng.choice((0, 0, 1, 2))):
+                words[rng.randrange(len(words))] = rng.choices(population, cum_weights=cumulative)[0]
+            text2.append(words)
+        else:
+            text2.append(sentence())
+    return [" ".join(words) + ".\n" for words in text1], [" ".join(words) + ".\n" for words in text2]
+
+
+class Stage:
+    # what search.measure records into
+    def __init__(self, name) -> None:
+        self.stats = SearchStats(name)
+
+
+def timed(name, results, trace_memory, run):
+    stage = Stage(name)
+    with measure(stage, trace_memory):
+        value, counts = run()
+    stats = stage.stats
+    results.put({"stage": name, "status": "ok", "seconds": stats.elapsed, "peak_memory": stats.peak_memory, "memory_source": stats.memory_source, **counts})
+    return value
+
+
+def run_case(sentences, overlap, seed, threshold, prune, trace_memory, results):
+    # the worker: one result per finished stage is put on results
+    rng = random.Random(f"{seed}-{sentences}-{overlap}")
+    text1, text2 = synthesize(sentences, overlap, rng)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, name) for name in ("file1.txt", "file2.txt")]
+        for path, text in zip(paths, (text1, text2)):
+            with open(path, "w") as file:
+                file.writelines(text)
+        size = sum(os.path.getsize(path) for path in paths)
+
+        def preprocess():
+            vocabulary = Vocabulary()
+            doc1, doc2 = vocabulary.read(paths[0]), vocabulary.read(paths[1])
+            return (vocabulary, doc1, doc2), {"bytes": size, "distinct": len(vocabulary.arrays)}
+
+        vocabulary, doc1, doc2 = timed("preprocess", results, trace_memory, preprocess)
+        text1 = [vocabulary.arrays[sid] for sid in doc1]
+        text2 = [vocabulary.arrays[sid] for sid in doc2]
+
+        def alignment():
+            agent = Agent()
+            cost = agent.DP(text1, text2)
+            return None, {"cost": cost, "pairs": sum(1 for i, j in agent.alignment if i is not None and j is not None)}
+
+        timed("alignment", results, trace_memory, alignment)
+
+        def scoring():
+            cache = DistanceCache(vocabulary, bit_parallel, maxsize=1 << 18)
+            plagiarised, _, scored, bound = score_pairs(vocabulary, doc1, doc2, threshold, prune, cache=cache)
+            return None, {"scored": scored, "bound": bound, "plagiarised": len(plagiarised), "hits": cache.hits, "misses": cache.misses}
+
+        timed("scoring", results, trace_memory, scoring)
+
+
+def run_one(sentences, overlap, seed=0, threshold=3, prune=False, trace_memory=False, timeout=300.0):
+    # -> one row per stage; stages not finished within timeout (or lost to
+    # a crashed worker) are reported with status "timeout"/"failed"
+    results = Queue()
+    worker = Process(target=run_case, args=(sentences, overlap, seed, threshold, prune, trace_memory, results))
+    worker.start()
+    rows = []
+    deadline = perf_counter() + timeout
+    status = "timeout"
+    while len(rows) < len(STAGES):
+        try:
+            rows.append(results.get(timeout=min(1.0, max(0.0, deadline - perf_counter()))))
+        except Empty:
+            if not worker.is_alive() and results.empty():
+                status = "failed"
+                break
+            if perf_counter() >= deadline:
+                break
+    if worker.is_alive():
+        worker.terminate()
+    worker.join()
+    for stage in STAGES[len(rows):]:
+        rows.append({"stage": stage, "status": status})
+    case = {"sentences": sentences, "overlap": overlap, "seed": seed, "threshold": threshold, "prune": prune}
+    return [{**case, **row} for row in rows]
+
+
+def case_key(row):
+    # what makes two rows the same case; rows written before prune existed
+    # were never pruned
+    return row["sentences"], row["overlap"], row["seed"], row["threshold"], row.get("prune", False)
+
+
+def load(path):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def run(path, sizes=SIZES, overlaps=OVERLAPS, label="", seed=0, threshold=3, prune=False, trace_memory=False, timeout=300.0):
+    # appends to the JSON lines file at path as cases finish; a rerun with the
+    # same label and settings only does the cases the file does not have yet
+    done = {case_key(row) for row in load(path) if row.get("label") == label}
+    environment = {"label": label, "python": platform.python_version(), "machine": platform.machine()}
+    rows = []
+    for sentences in sizes:
+        for overlap in overlaps:
+            if (sentences, overlap, seed, threshold, prune) in done:
+                continue
+            case = run_one(sentences, overlap, seed, threshold, prune, trace_memory, timeout)
+            for row in case:
+                print(f"{sentences:>8} {overlap:>5} {row['stage']:<11} " + (
+                    f"{row['seconds']:9.3f}s {row['peak_memory'] / 2**20:9.1f} MiB" if row["status"] == "ok" else row["status"]
+                ))
+            case = [{**environment, **row} for row in case]
+            if path:
+                with open(path, "a") as file:
+                    file.writelines(json.dumps(row) + "\n" for row in case)
+            rows.extend(case)
+    return rows
+
+
+def compare(old_path, new_path):
+    # -> rows of (sentences, overlap, seed, threshold, prune, stage, old
+    # seconds, new seconds, ratio) for the cases both files finished; the
+    # latest run of a case wins
+    def latest(path):
+        return {(*case_key(row), row["stage"]): row for row in load(path) if row["status"] == "ok"}
+
+    old, new = latest(old_path), latest(new_path)
+    for key in sorted(old.keys() & new.keys(), key=lambda key: (*key[:-1], STAGES.index(key[-1]))):
+        before, after = old[key]["seconds"], new[key]["seconds"]
+        yield (*key, before, after, after / before if before else float("inf"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="scaling benchmark for detect_plagiarism")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("run", help="time every stage over a grid of synthetic document pairs")
+    bench.add_argument("results")
+    bench.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    bench.add_argument("--overlaps", type=float, nargs="+", default=OVERLAPS)
+    bench.add_argument("--label", default="")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--threshold", type=int, default=3)
+    bench.add_argument("--prune", action="store_true")
+    bench.add_argument("--trace-memory", action="store_true")
+    bench.add_argument("--timeout", type=float, default=300.0)
+    diff = commands.add_parser("compare", help="stage times of two results files side by side")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args.results, args.sizes, args.overlaps, args.label, args.seed, args.threshold, args.prune, args.trace_memory, args.timeout)
+    else:
+        print(f"{'Sentences':<10}|{'Overlap':<8}|{'Seed':<6}|{'Threshold':<10}|{'Prune':<6}|{'Stage':<11}|{'Old (s)':<10}|{'New (s)':<10}|{'Ratio':<6}")
+        for sentences, overlap, seed, threshold, prune, stage, before, after, ratio in compare(args.old, args.new):
+            print(f"{sentences:<10}|{overlap:<8}|{seed:<6}|{threshold:<10}|{str(prune):<6}|{stage:<11}|{before:<10.3f}|{after:<10.3f}|{ratio:<6.2f}")
+
+
+if __name__ == "__main__":
+    main()
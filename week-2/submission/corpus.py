@@ -0,0 +1,181 @@
+"""
+Checking a submission against a whole corpus of archived documents.
+
+    python corpus.py index CORPUS_DIR INDEX_DIR     tokenize every .txt once
+    python corpus.py query INDEX_DIR SUBMISSION     candidates, then alignment
+
+The index is an inverted index of sentence shingles (3 consecutive words of
+a sentence, or the whole sentence if it is shorter), hashed to 64 bits:
+    keys.npy      sorted distinct shingle hashes (uint64)
+    offsets.npy   postings of keys[k] are postings[offsets[k]:offsets[k + 1]]
+    postings.npy  document ids (int32)
+    docs.json     document id -> path
+The arrays are memory-mapped by a query, so it only touches the postings of
+its own shingles. Documents sharing enough of them with the submission are
+aligned sentence by sentence (alignment.align). Tokenizing and aligning run
+in a process pool, and each stage reports its throughput.
+"""
+import argparse
+import json
+import os
+from hashlib import blake2b
+from multiprocessing import Pool
+from time import perf_counter
+
+import numpy as np
+
+from alignment import align
+from tokens import lines, sentences
+
+SHINGLE = 3
+
+
+def shingles(text):
+    # stable 64-bit hashes (hash() differs between processes) of a document
+    found = set()
+    for words in text:
+        for i in range(max(1, len(words) - SHINGLE + 1)):
+            digest = blake2b(" ".join(words[i:i + SHINGLE]).encode(), digest_size=8).digest()
+            found.add(int.from_bytes(digest, "little"))
+    return np.fromiter(found, dtype=np.uint64, count=len(found))
+
+
+def read(path):
+    return list(sentences(lines(path)))
+
+
+def tokenize(path):
+    return os.path.getsize(path), shingles(read(path))
+
+
+def report(stage, seconds, **counts):
+    rates = ", ".join(f"{count} {name} ({count / seconds:.0f}/s)" if seconds else f"{count} {name}" for name, count in counts.items())
+    print(f"{stage:<10} {seconds:8.2f}s  {rates}")
+    return {"stage": stage, "seconds": seconds, **counts}
+
+
+def build_index(corpus_dir, index_dir, workers=None):
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(corpus_dir)
+        for name in names
+        if name.endswith(".txt")
+    )
+    stages = []
+
+    began = perf_counter()
+    with Pool(workers) as pool:
+        tokenized = pool.map(tokenize, paths, chunksize=max(1, len(paths) // (4 * (workers or os.cpu_count() or 1))))
+    size = sum(bytes_read for bytes_read, _ in tokenized)
+    stages.append(report("tokenize", perf_counter() - began, documents=len(paths), bytes=size))
+
+    began = perf_counter()
+    keys = np.concatenate([found for _, found in tokenized]) if tokenized else np.zeros(0, dtype=np.uint64)
+    postings = np.repeat(np.arange(len(paths), dtype=np.int32), [len(found) for _, found in tokenized])
+    order = np.argsort(keys, kind="stable")
+    keys, postings = keys[order], postings[order]
+    distinct, starts = np.unique(keys, return_index=True)
+    offsets = np.append(starts, len(keys)).astype(np.int64)
+    stages.append(report("invert", perf_counter() - began, shingles=len(keys)))
+
+    began = perf_counter()
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "keys.npy"), distinct)
+    np.save(os.path.join(index_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(index_dir, "postings.npy"), postings)
+    with open(os.path.join(index_dir, "docs.json"), "w") as file:
+        json.dump([os.path.abspath(path) for path in paths], file)
+    written = sum(os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir))
+    stages.append(report("write", perf_counter() - began, bytes=written))
+    return stages
+
+
+class CorpusIndex:
+    def __init__(self, index_dir) -> None:
+        self.keys = np.load(os.path.join(index_dir, "keys.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(index_dir, "postings.npy"), mmap_mode="r")
+        with open(os.path.join(index_dir, "docs.json")) as file:
+            self.docs = json.load(file)
+
+    def shared(self, found):
+        # number of the given shingles each document contains
+        found = np.unique(found)
+        at = np.searchsorted(self.keys, found)
+        inside = at < len(self.keys)
+        at, found = at[inside], found[inside]
+        at = at[self.keys[at] == found]
+        # gather all the posting slices with one fancy index
+        starts, lengths = self.offsets[at], self.offsets[at + 1] - self.offsets[at]
+        ends = np.cumsum(lengths)
+        index = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - (ends - lengths), lengths)
+        return np.bincount(self.postings[index], minlength=len(self.docs))
+
+    def candidates(self, found, containment=0.05, limit=20):
+        # documents holding at least containment of the submission's
+        # shingles, most shared first
+        counts = self.shared(found)
+        order = np.argsort(-counts, kind="stable")[:limit]
+        need = max(1, containment * len(found))
+        return [(int(doc), int(counts[doc])) for doc in order if counts[doc] >= need]
+
+
+def compare(task):
+    text, path = task
+    cost, pairs = align(text, read(path))
+    return cost, sum(1 for i, j in pairs if i is not None and j is not None)
+
+
+def query(index_dir, submission, containment=0.05, limit=20, workers=None):
+    # -> (matches, stages); matches are (path, shared shingles, alignment
+    # cost, aligned sentence pairs), most aligned pairs first
+    stages = []
+
+    began = perf_counter()
+    index = CorpusIndex(index_dir)
+    text = read(submission)
+    found = shingles(text)
+    candidates = index.candidates(found, containment, limit)
+    stages.append(report("retrieve", perf_counter() - began, documents=len(index.docs), candidates=len(candidates)))
+
+    began = perf_counter()
+    tasks = [(text, index.docs[doc]) for doc, _ in candidates]
+    with Pool(workers) as pool:
+        aligned = pool.map(compare, tasks)
+    sentences = len(text) * len(tasks)
+    stages.append(report("align", perf_counter() - began, documents=len(tasks), sentences=sentences))
+
+    matches = [
+        (index.docs[doc], shared, cost, pairs)
+        for (doc, shared), (cost, pairs) in zip(candidates, aligned)
+    ]
+    matches.sort(key=lambda match: -match[3])
+    return matches, stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="plagiarism check against a document corpus")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index = commands.add_parser("index", help="tokenize a corpus into a shingle index")
+    index.add_argument("corpus")
+    index.add_argument("index")
+    index.add_argument("--workers", type=int)
+    search = commands.add_parser("query", help="find and align the documents a submission overlaps")
+    search.add_argument("index")
+    search.add_argument("submission")
+    search.add_argument("--containment", type=float, default=0.05)
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    if args.command == "index":
+        build_index(args.corpus, args.index, args.workers)
+    else:
+        matches, _ = query(args.index, args.submission, args.containment, args.limit, args.workers)
+        print(f"{'Document':<60}|{'Shared':<10}|{'Cost':<10}|{'Pairs':<10}")
+        for path, shared, cost, pairs in matches:
+            print(f"{path:<60}|{shared:<10}|{cost:<10}|{pairs:<10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Edit distance kernels over token sequences (word lists or interned id arrays).
+
+bit_parallel() is Myers' bit-vector algorithm in Hyyrö's formulation: one
+column of the DP table is held as +1/-1 vertical delta bit masks over the
+shorter sequence, so each token of the longer one costs a few integer ops.
+Up to 64 tokens the masks fit a machine word; Python ints carry across words
+by themselves, so longer sequences run the same code as a multi-word vector.
+
+block_distances() scores one query against a whole block of candidates with
+NumPy, sweeping the anti-diagonals of all the DP tables at once.
+"""
+import numpy as np
+
+
+def bit_parallel(s1, s2):
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    m = len(s2)
+    if not m:
+        return len(s1)
+    peq = {}
+    for i, token in enumerate(s2):
+        peq[token] = peq.get(token, 0) | (1 << i)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv = full, 0
+    score = m
+    for token in s1:
+        eq = peq.get(token, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # the top row of the table grows by one per token, hence the carry-in 1
+        ph = (ph << 1) | 1
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv & full
+    return score
+
+
+def block_distances(query, block):
+    # edit distance of query against every sequence in block, as an int array.
+    # Tokens must be non-negative ints (interned ids); candidates are padded
+    # with -1. Cell (i, j) lies on anti-diagonal i + j, whose cells only need
+    # the two previous diagonals, so each step is a few (block x m) array ops
+    m, size = len(query), len(block)
+    lengths = np.fromiter(map(len, block), dtype=np.int64, count=size)
+    if not m:
+        return lengths
+    width = int(lengths.max()) if size else 0
+    candidates = np.full((size, width + 1), -1, dtype=np.int64)
+    for b, tokens in enumerate(block):
+        candidates[b, : len(tokens)] = tokens
+    q = np.asarray(query, dtype=np.int64)
+    out = np.zeros(size, dtype=np.int64)
+
+    # diagonals are indexed by i, cells off the table hold a large value
+    big = m + width + 1
+    before = np.full((size, m + 1), big, dtype=np.int64)
+    previous = np.full((size, m + 1), big, dtype=np.int64)
+    previous[:, 0] = 0
+    for d in range(1, m + width + 1):
+        current = np.full((size, m + 1), big, dtype=np.int64)
+        if d <= width:
+            current[:, 0] = d
+        if d <= m:
+            current[:, d] = d
+        i = np.arange(max(1, d - width), min(m, d - 1) + 1)
+        if len(i):
+            j = d - i
+            cost = q[i - 1][None, :] != candidates[:, j - 1]
+            current[:, i] = np.minimum(
+                np.minimum(previous[:, i - 1], previous[:, i]) + 1,
+                before[:, i - 1] + cost,
+            )
+        done = lengths == d - m
+        out[done] = current[done, m]
+        before, previous = previous, current
+    return out
@@ -1,15 +1,18 @@
 import heapq
+from collections import Counter
+
+import numpy as np
+
+from alignment import align
+from kernels import bit_parallel, block_distances
+from pruning import CandidateIndex
+from tokens import DistanceCache, Vocabulary, sentences
 
 
 #  Utility Functions
 def preprocess(text):
-    text = [line.lower().strip()  for line in text]
-    for i, ch in enumerate(text):
-        if ch in "!#$%&'()*+,-/:;<=>?@[\\]^_{|}~`":
-            text[i] = text.replace(ch,"")
-    
-    
-    return [line.split() for line in text if line]
+    # lines -> word lists; Vocabulary.read streams a file straight to ids
+    return list(sentences(text))
 
 
 def levenshtein_dist(s1: str, s2: str):
@@ -29,30 +32,62 @@ def levenshtein_dist(s1: str, s2: str):
     return distances[m]
 
 
-def heuristic( i1, i2,file1, file2):
+def heuristic( i1, i2,file1, file2, distance=None):
+    # every sentence left in file1 is either skipped (1) or paired with one
+    # left in file2, so it adds at least min(1, its closest distance): admissible
+    if distance is None:
+        distance = lambda i, j: levenshtein_dist(file1[i], file2[j])
     h = 0
     for i in range(i1, len(file1)):
-        min_cost = float("inf")
+        min_cost = 1
         for j in range(i2, len(file2)):
-            min_cost = min(min_cost, levenshtein_dist(file1[i], file2[j]))
+            min_cost = min(min_cost, distance(i, j))
         h += min_cost
     return h
 
 
+def heuristic_table(file1, file2):
+    # -> (distance, table): distance[i][j] between sentence i of file1 and j of
+    # file2, computed once per distinct pair with the block kernel, and
+    # table[i1][i2] = heuristic(i1, i2, ...) from suffix row minimums summed
+    # from the bottom up, so a lookup replaces the O(n*m) loop
+    vocabulary = Vocabulary()
+    doc1, doc2 = vocabulary.document(file1), vocabulary.document(file2)
+    columns = sorted(set(doc2))
+    column = np.searchsorted(columns, doc2)
+    block = [vocabulary.arrays[sid] for sid in columns]
+    distance = np.zeros((len(doc1), len(doc2)), dtype=np.int64)
+    rows = {}
+    for i, sid in enumerate(doc1):
+        if sid not in rows:
+            rows[sid] = block_distances(vocabulary.arrays[sid], block)[column]
+        distance[i] = rows[sid]
+
+    closest = np.ones((len(doc1), len(doc2) + 1), dtype=np.int64)
+    if len(doc2):
+        closest[:, :-1] = np.minimum(np.minimum.accumulate(distance[:, ::-1], axis=1)[:, ::-1], 1)
+    table = np.zeros((len(doc1) + 1, len(doc2) + 1), dtype=np.int64)
+    table[:-1] = np.cumsum(closest[::-1], axis=0)[::-1]
+    return distance.tolist(), table.tolist()
+
+
 # State
 
 
 class State:
-    def __init__(self, i1, i2, cost, file1,file2, g=0) -> None:
+    def __init__(self, i1, i2, cost, file1,file2, g=0, h=None) -> None:
         self.i1 = i1
         self.i2 = i2
         self.cost = cost
         self.file1 = file1
         self.file2 = file2
         self.g = g
+        self.h = h  # filled from the heuristic table by Agent.Astar
 
     def f(self):
-        return self.g + heuristic(self.i1,self.i2,self.file1,self.file2)
+        if self.h is None:
+            self.h = heuristic(self.i1,self.i2,self.file1,self.file2)
+        return self.g + self.h
     
     def __lt__(self, other):
         return self.f() < other.f()
@@ -61,7 +96,7 @@ class State:
         return [state.i1, state.i2, state.cost] == [self.i1, self.i2, self.cost]
 
     def __hash__(self) -> int:
-        return hash(tuple(self.i1, self.i2, self.cost))
+        return hash((self.i1, self.i2, self.cost))
 
 
 # Search Agent
@@ -70,98 +105,167 @@ class State:
 class Agent:
     def __init__(self) -> None:
         self.memory = 0
+        self.alignment = []
+
+    def DP(self, file1, file2):
+        # exact alignment cost by dynamic programming (alignment.py) instead of A*;
+        # the aligned sentence pairs are left in self.alignment
+        cost, self.alignment = align(file1, file2)
+        return cost
 
     def Astar(self, file1, file2, initialState: State):
+        # distances and h come from tables built once; h is consistent, so
+        # the first time a position (i1, i2) is popped its cost is optimal
+        distance, table = heuristic_table(file1, file2)
+        initialState.g = initialState.cost
+        initialState.h = table[initialState.i1][initialState.i2]
         frontier = []
-        heapq.heappush(frontier, (initialState.g, initialState))
+        heapq.heappush(frontier, (initialState.f(), initialState))
         explored = set()
 
         while frontier:
             curr_cost, curr_state = heapq.heappop(frontier)
+            i1, i2 = curr_state.i1, curr_state.i2
+            if (i1, i2) in explored:
+                continue
+            explored.add((i1, i2))
 
-            if curr_state.i1 == len(file1) and curr_state.i2 == len(file2):
+            if i1 == len(file1) and i2 == len(file2):
                 return curr_state.cost
 
-            if curr_state.i1 < len(file1) and curr_state.i2 < len(file2):
-                edit_cost = levenshtein_dist(file1[curr_state.i1], file2[curr_state.i2])
-                new_cost = curr_state.cost + edit_cost
-
-                new_state = State(curr_state.i1 + 1, curr_state.i2 + 1, new_cost,file1,file2)
-                heapq.heappush(
-                    frontier,
-                    (
-                        new_cost + heuristic(new_state.i1, new_state.i2,file1, file2 ),
-                        new_state,
-                    ),
-                )
-
-            if curr_state.i1 < len(file1):
-                new_state = State(curr_state.i1 + 1, curr_state.i2, curr_state.cost + 1,file1,file2)
-                heapq.heappush(
-                    frontier,
-                    (
-                        new_state.cost
-                        + heuristic(new_state.i1, new_state.i2,file1, file2, ),
-                        new_state,
-                    ),
-                )
-
-            if curr_state.i2 < len(file2):
-                new_state = State(curr_state.i1, curr_state.i2 + 1, curr_state.cost + 1,file1,file2)
-                heapq.heappush(
-                    frontier,
-                    (
-                        new_state.cost
-                        + heuristic(new_state.i1, new_state.i2,file1, file2),
-                        new_state,
-                    ),
-                )
+            successors = []
+            if i1 < len(file1) and i2 < len(file2):
+                successors.append((i1 + 1, i2 + 1, curr_state.cost + distance[i1][i2]))
+            if i1 < len(file1):
+                successors.append((i1 + 1, i2, curr_state.cost + 1))
+            if i2 < len(file2):
+                successors.append((i1, i2 + 1, curr_state.cost + 1))
 
-        return None
+            for n1, n2, new_cost in successors:
+                if (n1, n2) in explored:
+                    continue
+                new_state = State(n1, n2, new_cost, file1, file2, new_cost, table[n1][n2])
+                heapq.heappush(frontier, (new_state.f(), new_state))
 
+        return None
 
-def detect_plagiarism(file1_path, file2_path,threshold = 3):
-    file1 = open(file1_path, "r")
-    file2 = open(file2_path, "r")
-
-    text1 = preprocess(file1.readlines())
-    text2 = preprocess(file2.readlines())
-    
-    search_agent = Agent()
-    total_cost = search_agent.Astar(text1, text2, State(0, 0, 0,text1,text2))
 
+# with prune=True the second document is indexed with LSH once it has more
+# distinct sentences than this
+LSH_SENTENCES = 1 << 16
+# a row with fewer uncached pairs than this goes pair by pair (bit_parallel),
+# below it the NumPy block kernel costs more than it saves
+BLOCK_PAIRS = 96
+
+
+def score_pairs(vocabulary, doc1, doc2, threshold = 3, prune = False, lsh = None, cache = None):
+    # -> (plagiarised, weighted_plagiarism_cost, scored, bound). Each sentence
+    # of doc1 is scored against the distinct sentences of doc2, with
+    # prune=True only those surviving the candidate filters (pruning.py);
+    # bound is the most the pairs left unscored could have added. Distances
+    # go through cache (a DistanceCache), so a sentence repeated in doc1 only
+    # computes the pairs that were evicted meanwhile
+    lengths = [len(tokens) for tokens in vocabulary.arrays]
+    columns = sorted(set(doc2))
+    positions = {sid: [] for sid in columns}
+    for j,sid in enumerate(doc2):
+        positions[sid].append(j)
+    block = [vocabulary.arrays[sid] for sid in columns]
+    if lsh is None:
+        lsh = len(block) > LSH_SENTENCES
+    index = CandidateIndex(block, threshold, lsh) if prune else None
+    if cache is None:
+        cache = DistanceCache(vocabulary, bit_parallel, maxsize=1 << 18)
+
+    # a pruned pair is at least |l1 - l2| edits apart, and more than threshold
+    # unless LSH missed it, so it adds at most 1 - that/longest sentence
+    def ceiling(l1, l2):
+        floor = abs(l1-l2) if lsh else max(threshold+1,abs(l1-l2))
+        return max(0.0,1-floor/max(l1,l2,1))
 
     plagiarised = []
     weighted_plagiarism_cost = 0
-    for i,sentence1 in enumerate(text1):
-        for j,sentence2 in enumerate(text2):
-            edit_dist = levenshtein_dist(sentence1,sentence2)
-            weighted_plagiarism_cost+= (1-edit_dist/max(len(sentence1),len(sentence2)))
+    scored = 0
+    scored_ceiling = 0
+    for i,s1 in enumerate(doc1):
+        if prune:
+            candidates = list(index.candidates(vocabulary.arrays[s1]))
+        else:
+            candidates = range(len(block))
+        if not candidates:
+            continue
+        row = [cache.get(s1,columns[c]) for c in candidates]
+        missing = [k for k,d in enumerate(row) if d is None]
+        if len(missing) >= BLOCK_PAIRS:
+            computed = block_distances(vocabulary.arrays[s1], [block[candidates[k]] for k in missing]).tolist()
+        else:
+            computed = [cache.distance(vocabulary.arrays[s1],block[candidates[k]]) for k in missing]
+        for k,d in zip(missing,computed):
+            row[k] = d
+            cache.put(s1,columns[candidates[k]],d)
+        found = []
+        for c,edit_dist in zip(candidates,row):
+            s2 = columns[c]
+            scored += len(positions[s2])
+            weighted_plagiarism_cost+= (1-edit_dist/max(lengths[s1],lengths[s2]))*len(positions[s2])
+            if prune:
+                scored_ceiling += ceiling(lengths[s1],lengths[s2])*len(positions[s2])
             if edit_dist<=threshold:
-                plagiarised.append((i,j,' '.join(sentence1),' '.join(sentence2),edit_dist))
-                
-                print(plagiarised[-1])
+                found.extend((j,edit_dist) for j in positions[s2])
+        for j,edit_dist in sorted(found):
+            plagiarised.append((i,j,' '.join(vocabulary.words_of(s1)),' '.join(vocabulary.words_of(doc2[j])),edit_dist))
 
+    bound = 0.0
+    if prune:
+        # ceilings of all pairs from the two length histograms, minus the scored ones
+        lengths1 = Counter(lengths[sid] for sid in doc1)
+        lengths2 = Counter(lengths[sid] for sid in doc2)
+        total = sum(c1*c2*ceiling(l1,l2) for l1,c1 in lengths1.items() for l2,c2 in lengths2.items())
+        bound = max(0.0,total-scored_ceiling)
+    return plagiarised, weighted_plagiarism_cost, scored, bound
 
-    plagiarism_percentage = min(100.0,weighted_plagiarism_cost*100/max(len(text1),len(text2)))
-    print("\nPLAGIARISM-PERCENTAGE: ",plagiarism_percentage)
 
+def verdict(plagiarism_percentage):
     if plagiarism_percentage>=95:
-        print("Identical Documents")
+        return "Identical Documents"
     elif plagiarism_percentage>=60:
-        print("Similar Document")
-        
+        return "Similar Document"
     elif plagiarism_percentage>=30:
-        print("Partial Overlap")
-        
+        return "Partial Overlap"
     elif plagiarism_percentage>=10:
-        print("Little Overlap")
+        return "Little Overlap"
+    return "No Overlap"
+
+
+def detect_plagiarism(file1_path, file2_path,threshold = 3,prune = False,lsh = None):
+    # both files are streamed into sentence ids over one vocabulary, a
+    # repeated sentence is stored once as an int array. prune=True only scores
+    # candidate pairs (faster on large documents) and reports how far the
+    # percentage could be off
+    vocabulary = Vocabulary()
+    doc1, doc2 = vocabulary.read(file1_path), vocabulary.read(file2_path)
+    text1 = [vocabulary.arrays[sid] for sid in doc1]
+    text2 = [vocabulary.arrays[sid] for sid in doc2]
+    
+    search_agent = Agent()
+    total_cost = search_agent.DP(text1, text2)
+
+    plagiarised, weighted_plagiarism_cost, scored, bound = score_pairs(vocabulary, doc1, doc2, threshold, prune, lsh)
+    for pair in plagiarised:
+        print(pair)
+
+
+    sentences = max(len(text1),len(text2),1)
+    plagiarism_percentage = min(100.0,weighted_plagiarism_cost*100/sentences)
+    print("\nPLAGIARISM-PERCENTAGE: ",plagiarism_percentage)
+    if prune:
+        highest = min(100.0,(weighted_plagiarism_cost+bound)*100/sentences)
+        print(f"SCORED-PAIRS: {scored} of {len(text1)*len(text2)}, pruned pairs could add at most {highest-plagiarism_percentage:.2f}")
 
-    else:
-        print("No Overlap")
+    print(verdict(plagiarism_percentage))
+    if prune and verdict(highest) != verdict(plagiarism_percentage):
+        print(f"(could be {verdict(highest)} with every pair scored, rerun without prune)")
     print("\n\n")
-    file1.close()
-    file2.close()
     return total_cost,len(text1),len(text2)
 
 
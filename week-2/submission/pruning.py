@@ -0,0 +1,92 @@
+"""
+Candidate filters for sentence pairs, so only pairs that may be within
+threshold edits get an exact edit distance.
+
+- length: an edit changes the length by at most one, so the distance is at
+  least |len1 - len2|
+- count: an edit removes at most one shared token, so a pair within t edits
+  shares at least max(len1, len2) - t tokens (as multisets)
+- MinHash-LSH: sentences hashed into buckets by bands of their MinHash
+  signature, a query only looks at sentences sharing a bucket
+
+The length and count filters are exact. LSH is not: a pair whose token sets
+have Jaccard similarity s shares a bucket with probability
+1 - (1 - s^rows)^bands (about 0.97 for s = 0.55 at the default 20 bands of 3
+rows). Pairs whose count bound is <= 0, both sentences at most t tokens, can
+share nothing and still be within t, so those skip LSH and are always
+candidates. lsh=False finds candidates exactly instead, counting shared tokens
+from an inverted index (token -> sentences) over the query's tokens.
+"""
+from collections import Counter
+
+import numpy as np
+
+PRIME = (1 << 31) - 1
+
+
+class CandidateIndex:
+    def __init__(self, sentences, threshold, lsh=True, bands=20, rows=3, seed=0) -> None:
+        # sentences: int arrays (interned token ids) of the indexed document
+        self.sentences = sentences
+        self.threshold = threshold
+        self.counts = [Counter(tokens) for tokens in sentences]
+        self.by_length = {}
+        for j, tokens in enumerate(sentences):
+            self.by_length.setdefault(len(tokens), []).append(j)
+        self.lsh = lsh
+        self.postings = {}
+        if not lsh:
+            for j, counts in enumerate(self.counts):
+                for token, count in counts.items():
+                    self.postings.setdefault(token, []).append((j, count))
+        self.bands, self.rows = bands, rows
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, bands * rows, dtype=np.int64)
+        self.b = rng.integers(0, PRIME, bands * rows, dtype=np.int64)
+        self.buckets = {}
+        if lsh:
+            for j, tokens in enumerate(sentences):
+                for key in self.keys(tokens):
+                    self.buckets.setdefault(key, []).append(j)
+        # pairs offered by LSH or the length window, and pairs left after the
+        # length and count filters
+        self.considered = 0
+        self.kept = 0
+
+    def keys(self, tokens):
+        # one bucket key per band of the MinHash signature
+        if not len(tokens):
+            return []
+        x = np.asarray(tokens, dtype=np.int64)
+        signature = ((self.a[:, None] * x[None, :] + self.b[:, None]) % PRIME).min(axis=1)
+        rows = self.rows
+        return [(band, signature[band * rows : (band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def window(self, low, high):
+        for length in range(max(low, 0), high + 1):
+            yield from self.by_length.get(length, ())
+
+    def candidates(self, query):
+        # indices of sentences that pass the filters for query, in order
+        t, n = self.threshold, len(query)
+        counts = Counter(query)
+        if self.lsh:
+            pool = set()
+            for key in self.keys(query):
+                pool.update(self.buckets.get(key, ()))
+            shared = {j: sum((counts & self.counts[j]).values()) for j in pool}
+        else:
+            shared = {}
+            for token, count in counts.items():
+                for j, other in self.postings.get(token, ()):
+                    shared[j] = shared.get(j, 0) + min(count, other)
+        if n <= t:
+            for j in self.window(0, t):
+                shared.setdefault(j, 0)
+        self.considered += len(shared)
+        for j in sorted(shared):
+            m = len(self.sentences[j])
+            if abs(n - m) > t or shared[j] < max(n, m) - t:
+                continue
+            self.kept += 1
+            yield j
@@ -0,0 +1,111 @@
+import mmap
+import os
+import string
+from array import array
+from collections import OrderedDict
+
+# stripped in one str.translate pass
+PUNCTUATION = str.maketrans("", "", string.punctuation)
+# files at least this large are read through a memory map
+MMAP_SIZE = 1 << 24
+
+
+def lines(path, encoding="utf-8"):
+    # the lines of a file one at a time, the file is never held as a whole
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size >= MMAP_SIZE:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for line in iter(mapped.readline, b""):
+                    yield line.decode(encoding, errors="replace")
+        else:
+            for line in file:
+                yield line.decode(encoding, errors="replace")
+
+
+def sentences(lines):
+    # one lowercased, punctuation-free word list per non-empty line
+    for line in lines:
+        words = line.lower().translate(PUNCTUATION).split()
+        if words:
+            yield words
+
+
+class Vocabulary:
+    # interns words to ints and sentences (as int arrays) to sentence ids, so
+    # a repeated sentence is stored and compared once
+    def __init__(self) -> None:
+        self.words = {}         # word -> id
+        self.tokens = []        # id -> word
+        self.sentences = {}     # word id bytes -> sentence id
+        self.arrays = []        # sentence id -> array of word ids
+
+    def encode(self, words):
+        ids = self.words
+        try:
+            return array("i", [ids[word] for word in words])
+        except KeyError:
+            # some word is new, rare once the vocabulary has warmed up
+            tokens = self.tokens
+            for word in words:
+                if word not in ids:
+                    ids[word] = len(tokens)
+                    tokens.append(word)
+            return array("i", [ids[word] for word in words])
+
+    def words_of(self, sid):
+        return [self.tokens[token] for token in self.arrays[sid]]
+
+    def sentence(self, words):
+        tokens = self.encode(words)
+        key = tokens.tobytes()
+        sid = self.sentences.get(key)
+        if sid is None:
+            sid = self.sentences[key] = len(self.arrays)
+            self.arrays.append(tokens)
+        return sid
+
+    def document(self, text):
+        # word lists -> array of sentence ids
+        return array("i", (self.sentence(words) for words in text))
+
+    def read(self, path):
+        # a file straight to an array of sentence ids, streamed line by line
+        return self.document(sentences(lines(path)))
+
+
+
+class DistanceCache:
+    # distance(sid1, sid2) between interned sentences, the most recently used
+    # maxsize distinct pairs kept; the distance is symmetric so (a, b) and
+    # (b, a) share an entry. get/put let a caller compute its misses in bulk
+    def __init__(self, vocabulary, distance, maxsize=1 << 16) -> None:
+        self.arrays = vocabulary.arrays
+        self.distance = distance
+        self.maxsize = maxsize
+        self.pairs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, a, b):
+        key = (a, b) if a <= b else (b, a)
+        d = self.pairs.get(key)
+        if d is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.pairs.move_to_end(key)
+        return d
+
+    def put(self, a, b, d):
+        key = (a, b) if a <= b else (b, a)
+        self.pairs[key] = d
+        self.pairs.move_to_end(key)
+        if len(self.pairs) > self.maxsize:
+            self.pairs.popitem(last=False)
+
+    def __call__(self, a, b):
+        d = self.get(a, b)
+        if d is None:
+            d = self.distance(self.arrays[a], self.arrays[b])
+            self.put(a, b, d)
+        return d